@@ -0,0 +1,91 @@
+# """
+# audio.py – Décodage en mémoire des enregistrements du candidat.
+# - decode_audio(data) : envoie les octets reçus (webm/ogg/wav…) à ffmpeg par stdin,
+#   lit sur stdout du PCM 16 bits mono 16 kHz et le convertit en tableau NumPy float32,
+#   le format attendu directement par Whisper. Aucun fichier intermédiaire.
+# - trim_silence(audio) : détection d'activité vocale par énergie (trames de 30 ms,
+#   seuil adapté au bruit de fond, plafonné sous la trame la plus forte) ; supprime les silences de début et de fin et
+#   raccourcit les pauses internes à VAD_MAX_PAUSE_SECONDS avant l'inférence.
+#   Retourne le signal réduit et le nombre de secondes retirées.
+# """
+
+import os
+import subprocess
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+ffmpeg_exec = os.getenv("FFMPEG_PATH", "ffmpeg")
+
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+VAD_FRAME_MS = 30
+VAD_PADDING_SECONDS = float(os.getenv("VAD_PADDING_SECONDS", "0.2"))
+VAD_MAX_PAUSE_SECONDS = float(os.getenv("VAD_MAX_PAUSE_SECONDS", "0.8"))
+# Plancher absolu (dBFS) sous lequel une trame est toujours considérée silencieuse
+VAD_MIN_DB = float(os.getenv("VAD_MIN_DB", "-50"))
+# Écart maximal (dB) sous la trame la plus forte au-delà duquel une trame reste de la parole
+VAD_PEAK_RANGE_DB = float(os.getenv("VAD_PEAK_RANGE_DB", "20"))
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+def decode_audio(data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Décode un fichier audio (octets bruts) en signal mono float32 dans [-1, 1].
+    """
+    cmd = [
+        ffmpeg_exec, "-nostdin", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    proc = subprocess.run(cmd, input=data, capture_output=True)
+    if proc.returncode != 0:
+        raise AudioDecodeError(proc.stderr.decode("utf-8", errors="ignore")[-500:])
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def trim_silence(audio: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                 padding: float = VAD_PADDING_SECONDS, max_pause: float = VAD_MAX_PAUSE_SECONDS):
+    """
+    Retire les silences de début/fin et raccourcit les longues pauses internes.
+    Retourne (signal réduit, secondes retirées). Un enregistrement sans aucune
+    trame vocale est renvoyé tel quel : Whisper tranchera.
+    """
+    frame = sample_rate * VAD_FRAME_MS // 1000
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return audio, 0.0
+
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    db = 20 * np.log10(np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-10)
+    # Seuil : 10 dB au-dessus du bruit de fond estimé (10e percentile), jamais sous VAD_MIN_DB.
+    # Sans silence dans l'extrait, le 10e percentile est de la parole : le plafond relatif
+    # au pic évite alors de traiter la parole plus faible comme du silence
+    noise_floor = np.percentile(db, 10) + 10
+    threshold = max(VAD_MIN_DB, min(noise_floor, db.max() - VAD_PEAK_RANGE_DB))
+    voiced = db > threshold
+    if not voiced.any():
+        return audio, 0.0
+
+    # Marge autour de la parole pour ne pas couper attaques et fins de mots
+    pad = int(round(padding * 1000 / VAD_FRAME_MS))
+    keep = np.convolve(voiced, np.ones(2 * pad + 1), mode="same") > 0
+
+    # Pauses internes : on ne garde que max_pause secondes (moitié de chaque côté)
+    half_pause = int(max_pause * 1000 / VAD_FRAME_MS) // 2
+    changes = np.flatnonzero(np.diff(keep.astype(np.int8))) + 1
+    bounds = np.concatenate(([0], changes, [n_frames]))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if keep[start] or start == 0 or end == n_frames:
+            continue
+        keep[start:start + half_pause] = True
+        keep[max(start, end - half_pause):end] = True
+
+    mask = np.repeat(keep, frame)
+    trimmed = audio[:n_frames * frame][mask]
+    if keep[-1]:
+        trimmed = np.concatenate((trimmed, audio[n_frames * frame:]))
+    return trimmed, (len(audio) - len(trimmed)) / sample_rate
@@ -0,0 +1,114 @@
+# """
+# benchmark_stt.py – Compare les moteurs de reconnaissance vocale (stt_engines.py).
+# - Pour chaque moteur, dans un processus séparé (pour isoler la mémoire) :
+#     • charge le modèle (STT_MODEL_SIZE / --model-size, --threads, --beam-size identique pour tous),
+#     • transcrit chaque extrait de samples/,
+#     • mesure le facteur temps réel (RTF = temps de calcul / durée audio) et le pic de RSS.
+# - Les extraits sont générés une fois avec edge_tts à partir de samples/phrases.txt
+#   (une phrase par ligne, de plus en plus longue) s'ils n'existent pas encore.
+#
+# Usage :
+#     python benchmark_stt.py
+#     python benchmark_stt.py --engines whisper,faster-whisper --model-size small --threads 4 --beam-size 5
+# """
+
+import argparse
+import asyncio
+import glob
+import multiprocessing
+import os
+import queue
+import resource
+import time
+
+from audio import SAMPLE_RATE, decode_audio
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+
+
+async def _generate_samples(voice: str):
+    import edge_tts
+
+    with open(os.path.join(SAMPLES_DIR, "phrases.txt"), encoding="utf-8") as f:
+        phrases = [line.strip() for line in f if line.strip()]
+    for i, phrase in enumerate(phrases, 1):
+        path = os.path.join(SAMPLES_DIR, f"sample_{i:02d}.mp3")
+        if not os.path.exists(path):
+            await edge_tts.Communicate(phrase, voice).save(path)
+            print(f"🎙️ Extrait généré : {path}")
+
+
+def _run_engine(engine_name: str, clips: list, options: dict, results):
+    from stt_engines import load_engine
+
+    start = time.perf_counter()
+    engine = load_engine(engine_name, **options)
+    load_seconds = time.perf_counter() - start
+
+    rows = []
+    for clip in clips:
+        with open(clip, "rb") as f:
+            audio = decode_audio(f.read())
+        duration = len(audio) / SAMPLE_RATE
+        start = time.perf_counter()
+        text = engine.transcribe(audio)["text"]
+        elapsed = time.perf_counter() - start
+        rows.append({
+            "clip": os.path.basename(clip),
+            "audio_seconds": duration,
+            "seconds": elapsed,
+            "rtf": elapsed / duration if duration else 0.0,
+            "text": text.strip(),
+        })
+
+    # ru_maxrss est en Kio sous Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put({"engine": engine_name, "load_seconds": load_seconds, "peak_rss_mb": peak_rss_mb, "clips": rows})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des moteurs STT (RTF et pic de RSS).")
+    parser.add_argument("--engines", default="whisper,faster-whisper")
+    parser.add_argument("--model-size", default=os.getenv("STT_MODEL_SIZE", "base"))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("STT_THREADS", "0")))
+    parser.add_argument("--language", default=os.getenv("STT_LANGUAGE") or "fr")
+    parser.add_argument("--beam-size", type=int, default=int(os.getenv("STT_BEAM_SIZE", "1")))
+    parser.add_argument("--voice", default=os.getenv("TTS_VOICE", "fr-FR-DeniseNeural"))
+    args = parser.parse_args()
+
+    asyncio.run(_generate_samples(args.voice))
+    clips = sorted(glob.glob(os.path.join(SAMPLES_DIR, "*.mp3")) + glob.glob(os.path.join(SAMPLES_DIR, "*.wav")))
+    options = {"model_size": args.model_size, "threads": args.threads, "language": args.language,
+               "beam_size": args.beam_size}
+
+    ctx = multiprocessing.get_context("spawn")
+    for engine_name in args.engines.split(","):
+        results = ctx.Queue()
+        proc = ctx.Process(target=_run_engine, args=(engine_name.strip(), clips, options, results))
+        proc.start()
+        # Lire le résultat avant join() : un processus qui a encore des données dans la
+        # file ne se termine pas tant qu'elles n'ont pas été consommées
+        report = None
+        while report is None and (proc.is_alive() or not results.empty()):
+            try:
+                report = results.get(timeout=1)
+            except queue.Empty:
+                pass
+        proc.join()
+        if report is None:
+            print(f"❌ {engine_name} : échec (code {proc.exitcode})")
+            continue
+
+        total_audio = sum(r["audio_seconds"] for r in report["clips"])
+        total_compute = sum(r["seconds"] for r in report["clips"])
+        print(f"\n=== {report['engine']} ({args.model_size}, threads={args.threads or 'défaut'}, "
+              f"beam={args.beam_size}) ===")
+        print(f"Chargement du modèle : {report['load_seconds']:.2f} s — pic RSS : {report['peak_rss_mb']:.0f} Mo")
+        for r in report["clips"]:
+            print(f"  {r['clip']:<16} {r['audio_seconds']:6.1f} s audio  {r['seconds']:6.2f} s  RTF {r['rtf']:.3f}  « {r['text'][:60]} »")
+        if total_audio:
+            print(f"  RTF global : {total_compute / total_audio:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# """
+# browser_pool.py – Chromium headless partagé pour le scraping des offres.
+# - Un seul navigateur Playwright, lancé au démarrage du serveur (lifespan) et réutilisé
+#   par toutes les requêtes /scrape et /extract_job.
+# - Les contextes (cookies, cache HTTP) sont gardés dans un pool par type (ex. "linkedin"
+#   avec le cookie li_at) et recyclés après SCRAPER_CONTEXT_MAX_USES pages.
+# - Au plus SCRAPER_MAX_PAGES pages ouvertes en même temps (sémaphore) ; les suivantes attendent.
+# - Toutes les SCRAPER_HEALTHCHECK_SECONDS, vérifie que le navigateur répond et le relance
+#   s'il a planté ; une page demandée après un plantage relance aussi le navigateur.
+#   Un échec de lancement au démarrage est seulement signalé : le reste du serveur
+#   (/context, /transcribe, /audio…) démarre quand même, et le navigateur sera relancé
+#   par la vérification périodique ou la première page demandée.
+# - Chaque contexte intercepte ses requêtes : images, polices, médias et feuilles de style
+#   (SCRAPER_BLOCK_RESOURCE_TYPES) et domaines de pistage (TRACKER_DOMAINS + SCRAPER_BLOCK_DOMAINS)
+#   sont annulés, sauf pour les domaines de SCRAPER_ALLOW_DOMAINS. Le document lui-même passe toujours.
+#   Les scripts et les XHR/fetch des autres hôtes ne sont pas bloqués par défaut : Playwright
+#   n'est utilisé qu'en repli, quand le HTML serveur ne suffit pas, et c'est alors le JavaScript
+#   (et ses appels d'API) qui construit le contenu de l'offre (WTTJ, LinkedIn). Les traceurs
+#   connus sont coupés par domaine ; "script" ou "xhr" peuvent être ajoutés à la variable.
+# """
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+from playwright.async_api import async_playwright
+
+SCRAPER_MAX_PAGES = int(os.getenv("SCRAPER_MAX_PAGES", "4"))
+SCRAPER_MAX_IDLE_CONTEXTS = int(os.getenv("SCRAPER_MAX_IDLE_CONTEXTS", "4"))
+SCRAPER_CONTEXT_MAX_USES = int(os.getenv("SCRAPER_CONTEXT_MAX_USES", "50"))
+SCRAPER_HEALTHCHECK_SECONDS = int(os.getenv("SCRAPER_HEALTHCHECK_SECONDS", "30"))
+
+
+def _env_list(name: str, default: str = "") -> tuple:
+    return tuple(item.strip().lower() for item in os.getenv(name, default).split(",") if item.strip())
+
+
+SCRAPER_BLOCK_RESOURCE_TYPES = _env_list("SCRAPER_BLOCK_RESOURCE_TYPES", "image,font,media,stylesheet")
+SCRAPER_BLOCK_DOMAINS = _env_list("SCRAPER_BLOCK_DOMAINS")
+SCRAPER_ALLOW_DOMAINS = _env_list("SCRAPER_ALLOW_DOMAINS")
+
+# Mesure d'audience, publicité et replay de session : inutiles pour lire une offre
+TRACKER_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "googleadservices.com", "facebook.net", "connect.facebook.net", "hotjar.com", "hotjar.io",
+    "segment.com", "segment.io", "mixpanel.com", "amplitude.com", "fullstory.com", "clarity.ms",
+    "bat.bing.com", "criteo.com", "criteo.net", "taboola.com", "outbrain.com", "adsrvr.org",
+    "px.ads.linkedin.com", "snap.licdn.com", "ads-twitter.com", "analytics.tiktok.com",
+    "sentry.io", "datadoghq-browser-agent.com", "intercom.io", "axeptio.eu",
+)
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36"
+)
+
+
+class BrowserPool:
+    def __init__(self, max_pages=SCRAPER_MAX_PAGES, max_idle_contexts=SCRAPER_MAX_IDLE_CONTEXTS,
+                 context_max_uses=SCRAPER_CONTEXT_MAX_USES, healthcheck_seconds=SCRAPER_HEALTHCHECK_SECONDS):
+        self.max_pages = max_pages
+        self.max_idle_contexts = max_idle_contexts
+        self.context_max_uses = context_max_uses
+        self.healthcheck_seconds = healthcheck_seconds
+        self._playwright = None
+        self._browser = None
+        self._idle = {}  # type de contexte → [(contexte, nombre d'utilisations)]
+        self._lock = asyncio.Lock()
+        self._pages = asyncio.Semaphore(max_pages)
+        self._health_task = None
+        self.launches = 0
+        self.contexts_created = 0
+        self.pages_served = 0
+        self.pages_open = 0
+        self.waiting = 0
+        self.blocked_types = set(SCRAPER_BLOCK_RESOURCE_TYPES)
+        self.blocked_domains = TRACKER_DOMAINS + SCRAPER_BLOCK_DOMAINS
+        self.allowed_domains = SCRAPER_ALLOW_DOMAINS
+        self.requests_allowed = 0
+        self.requests_blocked = 0
+
+    def healthy(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self.healthy():
+                return self._browser
+            if self._browser is not None:
+                print("⚠️ Navigateur Chromium déconnecté, relance.")
+                # Les contextes d'un navigateur mort sont inutilisables
+                self._idle.clear()
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self.launches += 1
+            return self._browser
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.healthcheck_seconds)
+            try:
+                await self._ensure_browser()
+            except Exception as e:
+                print("⚠️ Relance du navigateur impossible :", e)
+
+    async def start(self):
+        try:
+            await self._ensure_browser()
+        except Exception as e:
+            print("⚠️ Lancement de Chromium impossible, nouvel essai plus tard :", e)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+        async with self._lock:
+            self._idle.clear()
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def _route(self, route):
+        request = route.request
+        host = (urlsplit(request.url).hostname or "").lower()
+        if request.is_navigation_request() and request.frame.parent_frame is None:
+            # Le document de la page passe toujours (redirections comprises)
+            self.requests_allowed += 1
+            await route.continue_()
+        elif not _matches(host, self.allowed_domains) and (
+                request.resource_type in self.blocked_types or _matches(host, self.blocked_domains)):
+            self.requests_blocked += 1
+            await route.abort()
+        else:
+            self.requests_allowed += 1
+            await route.continue_()
+
+    async def _acquire_context(self, kind: str, cookies: list):
+        browser = await self._ensure_browser()
+        idle = self._idle.get(kind, [])
+        while idle:
+            context, uses = idle.pop()
+            if context.browser is browser:
+                return context, uses
+        context = await browser.new_context(user_agent=USER_AGENT)
+        await context.route("**/*", self._route)
+        if cookies:
+            await context.add_cookies(cookies)
+        self.contexts_created += 1
+        return context, 0
+
+    async def _release_context(self, kind: str, context, uses: int, reusable: bool):
+        idle = self._idle.setdefault(kind, [])
+        if reusable and uses < self.context_max_uses and len(idle) < self.max_idle_contexts and self.healthy():
+            idle.append((context, uses))
+            return
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self, kind: str = "default", cookies: list = None):
+        """
+        Fournit une page neuve dans un contexte réutilisé du type `kind`
+        (les `cookies` ne sont posés qu'à la création du contexte).
+        """
+        self.waiting += 1
+        async with self._pages:
+            self.waiting -= 1
+            context, uses = await self._acquire_context(kind, cookies)
+            page = None
+            reusable = False
+            self.pages_open += 1
+            try:
+                page = await context.new_page()
+                yield page
+                reusable = True
+            finally:
+                self.pages_open -= 1
+                self.pages_served += 1
+                if page is not None:
+                    try:
+                        await page.close()
+                    except Exception:
+                        reusable = False
+                await self._release_context(kind, context, uses + 1, reusable)
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy(),
+            "launches": self.launches,
+            "contexts_created": self.contexts_created,
+            "idle_contexts": sum(len(idle) for idle in self._idle.values()),
+            "pages_open": self.pages_open,
+            "pages_waiting": self.waiting,
+            "pages_served": self.pages_served,
+            "max_pages": self.max_pages,
+            "requests_allowed": self.requests_allowed,
+            "requests_blocked": self.requests_blocked,
+        }
+
+
+def _matches(host: str, domains: tuple) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
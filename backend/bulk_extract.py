@@ -0,0 +1,102 @@
+# """
+# bulk_extract.py – Extraction d'une liste d'offres, résultats diffusés au fil de l'eau.
+# - extract_many(urls, cache) : générateur asynchrone d'un résultat par URL, dans l'ordre
+#   où les extractions se terminent : {"index", "url", …offre} ou {"index", "url", "error"}.
+#   Une URL en échec ne fait jamais échouer le lot.
+# - Au plus BULK_CONCURRENCY extractions en cours pour le lot.
+# - Politesse par site : au plus BULK_PER_HOST_CONCURRENCY requêtes simultanées vers un même
+#   hôte, et au moins BULK_PER_HOST_DELAY_SECONDS entre deux démarrages vers cet hôte.
+# - Les offres déjà en cache (scrape_cache) sont renvoyées tout de suite, sans attendre de créneau ;
+#   une URL déjà en cours d'extraction rejoint ce scraping sans créneau ni délai de politesse.
+# - Le créneau de l'hôte est pris avant celui du lot : une URL qui attend un hôte saturé
+#   ne bloque pas les URL des autres hôtes.
+# Le format NDJSON produit par /extract_jobs se relit directement avec
+# frontend/batch_scoring.py --offers (les lignes en erreur y sont ignorées).
+# """
+
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+BULK_MAX_URLS = int(os.getenv("BULK_MAX_URLS", "200"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "6"))
+BULK_PER_HOST_CONCURRENCY = int(os.getenv("BULK_PER_HOST_CONCURRENCY", "2"))
+BULK_PER_HOST_DELAY_SECONDS = float(os.getenv("BULK_PER_HOST_DELAY_SECONDS", "0.5"))
+
+
+class HostLimiter:
+    """
+    Créneaux par hôte : sémaphore + espacement minimal entre deux démarrages.
+    Partagé par tous les lots, pour que deux imports simultanés restent polis ensemble.
+    """
+
+    def __init__(self, per_host=BULK_PER_HOST_CONCURRENCY, delay_seconds=BULK_PER_HOST_DELAY_SECONDS):
+        self.per_host = per_host
+        self.delay_seconds = delay_seconds
+        self._semaphores = {}
+        self._locks = {}
+        self._last_start = {}
+
+    def slot(self, url: str):
+        host = (urlsplit(url).hostname or "").lower()
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host)
+            self._locks[host] = asyncio.Lock()
+        return _HostSlot(self, host)
+
+
+class _HostSlot:
+    def __init__(self, limiter: HostLimiter, host: str):
+        self.limiter = limiter
+        self.host = host
+
+    async def __aenter__(self):
+        limiter = self.limiter
+        await limiter._semaphores[self.host].acquire()
+        try:
+            async with limiter._locks[self.host]:
+                wait = limiter._last_start.get(self.host, 0) + limiter.delay_seconds - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                limiter._last_start[self.host] = time.monotonic()
+        except BaseException:
+            limiter._semaphores[self.host].release()
+            raise
+
+    async def __aexit__(self, *exc):
+        self.limiter._semaphores[self.host].release()
+
+
+host_limiter = HostLimiter()
+
+
+async def extract_many(urls: list, cache, concurrency: int = BULK_CONCURRENCY, limiter: HostLimiter = host_limiter):
+    """
+    Produit un dict par URL dès que son extraction se termine (voir l'en-tête du module).
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = asyncio.Queue()
+
+    async def extract_one(index: int, url: str):
+        result = {"index": index, "url": url}
+        try:
+            job = cache.cached(url)
+            if job is None and cache.in_flight(url):
+                job = await cache.get(url)
+            elif job is None:
+                async with limiter.slot(url), semaphore:
+                    job = await cache.get(url)
+            result.update(job)
+        except Exception as e:
+            result["error"] = str(e) or type(e).__name__
+        await results.put(result)
+
+    tasks = [asyncio.create_task(extract_one(i, url)) for i, url in enumerate(urls)]
+    try:
+        for _ in tasks:
+            yield await results.get()
+    finally:
+        # Client déconnecté : on arrête les extractions restantes
+        for task in tasks:
+            task.cancel()
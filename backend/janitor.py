@@ -0,0 +1,119 @@
+# """
+# janitor.py – Nettoyage en tâche de fond des fichiers audio générés.
+# - Toutes les JANITOR_INTERVAL_SECONDS, balaie les fichiers temporaires :
+#     • static/output_*.mp3 (réponses synthétisées) et static/*.part (écritures interrompues),
+#     • les anciens temp_*.wav / output_*.wav / converted_*.wav à la racine.
+# - Supprime ceux de plus de JANITOR_MAX_AGE_SECONDS, puis, si le total dépasse
+#   JANITOR_MAX_BYTES, les plus anciens d'abord jusqu'à repasser sous le budget.
+# - stats() expose le volume actuel et le cumul des suppressions pour dimensionner le volume.
+# """
+
+import asyncio
+import glob
+import os
+import time
+
+JANITOR_INTERVAL_SECONDS = int(os.getenv("JANITOR_INTERVAL_SECONDS", "60"))
+JANITOR_MAX_AGE_SECONDS = int(os.getenv("JANITOR_MAX_AGE_SECONDS", "600"))
+JANITOR_MAX_BYTES = int(os.getenv("JANITOR_MAX_BYTES", str(200 * 1024 * 1024)))
+
+TEMP_PATTERNS = [
+    os.path.join("static", "output_*.mp3"),
+    os.path.join("static", "*.part"),
+    "temp_*.wav",
+    "output_*.wav",
+    "converted_*.wav",
+]
+
+
+class TempJanitor:
+    def __init__(self, patterns=TEMP_PATTERNS, max_age_seconds=JANITOR_MAX_AGE_SECONDS,
+                 max_bytes=JANITOR_MAX_BYTES, interval_seconds=JANITOR_INTERVAL_SECONDS):
+        self.patterns = patterns
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.interval_seconds = interval_seconds
+        self.sweeps = 0
+        self.last_sweep = None
+        self.removed_by_age = 0
+        self.removed_by_quota = 0
+        self.bytes_removed = 0
+        self.current_files = 0
+        self.current_bytes = 0
+        self._task = None
+
+    def _list_files(self) -> list:
+        files = []
+        for pattern in self.patterns:
+            for path in glob.glob(pattern):
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        return files
+
+    def _remove(self, path: str, size: int) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        self.bytes_removed += size
+        return True
+
+    def sweep(self) -> dict:
+        """
+        Un passage de nettoyage (bloquant) : âge puis budget disque, plus anciens d'abord.
+        """
+        now = time.time()
+        kept = []
+        for mtime, size, path in self._list_files():
+            if now - mtime > self.max_age_seconds:
+                self.removed_by_age += self._remove(path, size)
+            else:
+                kept.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in kept)
+        while kept and total > self.max_bytes:
+            _, size, path = kept.pop(0)
+            self.removed_by_quota += self._remove(path, size)
+            total -= size
+
+        self.sweeps += 1
+        self.last_sweep = now
+        self.current_files = len(kept)
+        self.current_bytes = total
+        return self.stats()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                print("⚠️ Erreur lors du nettoyage des fichiers temporaires :", e)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "last_sweep": self.last_sweep,
+            "current_files": self.current_files,
+            "current_bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age_seconds,
+            "removed_by_age": self.removed_by_age,
+            "removed_by_quota": self.removed_by_quota,
+            "bytes_removed": self.bytes_removed,
+        }
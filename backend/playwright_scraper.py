@@ -1,8 +1,12 @@
 import asyncio
-from playwright.async_api import async_playwright
+import os
+import time
 from bs4 import BeautifulSoup
+import httpx
 import json
 
+from browser_pool import USER_AGENT, BrowserPool
+
 LI_AT = "AQEDAVs2AxYDC03PAAABlyVnENEAAAGXSXOU0U0ATqlSgBjVeF1LL_gHhR2d0byOi2e-UMH1-hC0phnJTFHTUQsfvzvegmEh4dKm6bJrZ9BEY6kNWCrQzBfxH7i1oon14GJLgJy1ouCN9kzhcoUMlzLX"
 
 
@@ -10,33 +14,107 @@ LI_AT = "AQEDAVs2AxYDC03PAAABlyVnENEAAAGXSXOU0U0ATqlSgBjVeF1LL_gHhR2d0byOi2e-UMH
 # playwright_scraper.py – Module pour extraire une offre d’emploi depuis différents sites.
 # - extract_linkedin_job(url) : 
 #     • Utilise Playwright headless pour naviguer sur LinkedIn.
-#     • Attends le contenu, récupère titre, entreprise, lieu, description via CSS selectors.
-# - extract_wttj_job(url) :
+#     • Attends le contenu (sélecteurs ; réseau calme seulement s'ils n'apparaissent pas, sans pause fixe),
+#       récupère titre, entreprise, lieu, description via CSS selectors.
+# - fetch_wttj_job_http(url) (voie rapide, sans navigateur) :
+#     • Simple GET HTTP (client httpx partagé, connexions keep-alive) du HTML rendu côté serveur.
+#     • Parse le JSON-LD JobPosting ; renvoie None si titre, entreprise ou description manquent.
+# - extract_wttj_job(url) (repli) :
 #     • Utilise Playwright pour naviguer sur WelcomeToTheJungle.
-#     • Clique sur “Voir plus” (jusqu’à 3 fois) pour déplier la description.
+#     • Clique sur “Voir plus” (jusqu’à 3 fois) pour déplier la description, en attendant
+#       après chaque clic que le bouton disparaisse (SCRAPER_EXPAND_TIMEOUT_MS).
+#     • Images, polices, médias et traceurs sont bloqués par browser_pool.
 #     • Recherche dans le DOM un <script type="application/ld+json"> contenant @type="JobPosting".
 #     • Si trouvé, parse JSON-LD ; sinon, fallback sur balises <h1>, <a data-testid="company-link">, etc.
+#     • Le parsing (parse_wttj_html) est commun aux deux voies.
 # - extract_job_posting(url) : 
 #     • Détecte le domaine (LinkedIn vs WTTJ vs autres).
 #     • Appelle la fonction correspondante ou renvoie {"error": "Site non supporté"}.
+#     • Renvoie aussi "_validators" (ETag / Last-Modified de la page) pour le cache (scrape_cache) ;
+#       is_complete_job() écarte du cache les extractions dégradées (titre ou description par défaut).
+#     • WTTJ : voie HTTP d'abord, Playwright seulement si des champs manquent ; le champ "tier"
+#       de la réponse ("http" ou "playwright") et tier_stats indiquent quelle voie a répondu.
+#     • Les pages viennent du navigateur partagé browser_pool (lancé dans le lifespan du serveur) ;
+#       si le navigateur plante pendant l'extraction, elle est relancée une fois sur un navigateur neuf.
 # """
 
+WTTJ_HTTP_TIMEOUT = float(os.getenv("WTTJ_HTTP_TIMEOUT", "8"))
+WTTJ_HTTP_MAX_CONNECTIONS = int(os.getenv("WTTJ_HTTP_MAX_CONNECTIONS", "10"))
+# Délais (ms) des attentes Playwright : navigation, apparition du contenu, dépliage « Voir plus »
+SCRAPER_NAV_TIMEOUT_MS = int(os.getenv("SCRAPER_NAV_TIMEOUT_MS", "60000"))
+SCRAPER_CONTENT_TIMEOUT_MS = int(os.getenv("SCRAPER_CONTENT_TIMEOUT_MS", "8000"))
+SCRAPER_EXPAND_TIMEOUT_MS = int(os.getenv("SCRAPER_EXPAND_TIMEOUT_MS", "2000"))
+SCRAPER_SELECTOR_TIMEOUT_MS = int(os.getenv("SCRAPER_SELECTOR_TIMEOUT_MS", "3000"))
+# Attente du réseau calme, seulement si le contenu attendu n'est pas apparu (LinkedIn n'y arrive jamais)
+SCRAPER_IDLE_TIMEOUT_MS = int(os.getenv("SCRAPER_IDLE_TIMEOUT_MS", "2000"))
+# Champs du JSON-LD sans lesquels la voie HTTP passe la main à Playwright
+WTTJ_REQUIRED_FIELDS = ("title", "company", "description")
+# Valeurs renvoyées pour un champ introuvable (délai dépassé, mur de connexion…)
+PLACEHOLDERS = {
+    "title": "(Titre non trouvé)",
+    "company": "(Entreprise non trouvée)",
+    "location": "(Localisation non trouvée)",
+    "description": "(Description non trouvée)",
+}
+# Une offre dont l'un de ces champs est un PLACEHOLDERS n'est pas mise en cache
+CACHE_REQUIRED_FIELDS = ("title", "description")
+
+browser_pool = BrowserPool()
+tier_stats = {
+    "http": {"count": 0, "seconds": 0.0},
+    "playwright": {"count": 0, "seconds": 0.0},
+    "http_fallbacks": 0,
+}
+_http_client = None
+WTTJ_CONTENT_SELECTOR = "script[type='application/ld+json'], article, main"
+LINKEDIN_CONTENT_SELECTOR = "div.jobs-description__container, div.jobs-box__html-content, h1"
+_COUNT_VOIR_PLUS = (
+    "() => [...document.querySelectorAll('button')].filter(b => b.innerText.includes('Voir plus')).length"
+)
+
+LINKEDIN_COOKIES = [{
+    "name": "li_at",
+    "value": LI_AT,
+    "domain": ".linkedin.com",
+    "path": "/",
+    "secure": True,
+    "httpOnly": True,
+    "sameSite": "Lax"
+}]
+
+async def _wait_for_content(page, selector: str, timeout_ms: int = SCRAPER_CONTENT_TIMEOUT_MS,
+                            idle_timeout_ms: int = SCRAPER_IDLE_TIMEOUT_MS):
+    """
+    Attend qu'un des sélecteurs soit présent dans le DOM ; s'il n'apparaît pas à temps,
+    laisse encore au réseau idle_timeout_ms pour se calmer. Un dépassement n'est pas une
+    erreur (on lit ce qui est là).
+    """
+    try:
+        await page.wait_for_selector(selector, state="attached", timeout=timeout_ms)
+        return
+    except Exception:
+        print(f"⚠️ Contenu « {selector} » absent après {timeout_ms} ms")
+    try:
+        await page.wait_for_load_state("networkidle", timeout=idle_timeout_ms)
+    except Exception:
+        pass
+
+
 async def extract_linkedin_job(page, url):
     """
     (Si besoin plus tard) extraction simplifiée sur LinkedIn.
     Pour l’instant, on se concentre sur WTTJ.
     """
-    await page.goto(url, timeout=60000, wait_until="load")
-    await page.wait_for_timeout(3000)
+    response = await page.goto(url, timeout=SCRAPER_NAV_TIMEOUT_MS, wait_until="domcontentloaded")
+    await _wait_for_content(page, LINKEDIN_CONTENT_SELECTOR)
     await page.evaluate("window.scrollTo(0, 0)")
-    await page.wait_for_timeout(1000)
 
     async def first_visible_text(*selectors):
         for sel in selectors:
             locator = page.locator(sel)
             if await locator.count() > 0:
                 try:
-                    await locator.first.wait_for(state="visible", timeout=5000)
+                    await locator.first.wait_for(state="visible", timeout=SCRAPER_SELECTOR_TIMEOUT_MS)
                     return await locator.first.text_content()
                 except:
                     continue
@@ -48,10 +126,11 @@ async def extract_linkedin_job(page, url):
     description = await first_visible_text("div.jobs-description__container", "div.jobs-box__html-content")
 
     return {
-        "title": title.strip() if title else "(Titre non trouvé)",
-        "company": company.strip() if company else "(Entreprise non trouvée)",
-        "location": location.strip() if location else "(Localisation non trouvée)",
-        "description": description.strip() if description else "(Description non trouvée)"
+        "title": title.strip() if title else PLACEHOLDERS["title"],
+        "company": company.strip() if company else PLACEHOLDERS["company"],
+        "location": location.strip() if location else PLACEHOLDERS["location"],
+        "description": description.strip() if description else PLACEHOLDERS["description"],
+        "_validators": _validators(response.headers) if response else {},
     }
 
 
@@ -74,25 +153,107 @@ async def extract_wttj_job(page, url):
     # - Nettoyage de la description (supprimer balises HTML superflues).
     # - Retourne un dict { "title", "company", "location", "description" }.
     # """
-    await page.goto(url, timeout=60000, wait_until="load")
-    await page.wait_for_timeout(3000)
+    response = await page.goto(url, timeout=SCRAPER_NAV_TIMEOUT_MS, wait_until="domcontentloaded")
+    await _wait_for_content(page, WTTJ_CONTENT_SELECTOR)
 
-    # 1) Cliquer sur « Voir plus » (déplier éventuels blocs cachés)
+    # 1) Cliquer sur « Voir plus » (déplier éventuels blocs cachés) ; après chaque clic,
+    #    on attend que le bouton cliqué ait disparu plutôt qu'un délai fixe
     for _ in range(3):
         try:
             btn = page.locator("button:has-text('Voir plus')")
-            if await btn.count() == 0:
+            remaining = await btn.count()
+            if remaining == 0:
                 break
-            await btn.first.click()
-            await page.wait_for_timeout(1000)
+            await btn.first.click(timeout=SCRAPER_EXPAND_TIMEOUT_MS)
+            await page.wait_for_function(f"({_COUNT_VOIR_PLUS})() < {remaining}",
+                                         timeout=SCRAPER_EXPAND_TIMEOUT_MS)
         except:
             break
 
     # 2) Récupérer le contenu HTML après les déplieurs
-    html = await page.content()
-    soup = BeautifulSoup(html, "html.parser")
+    job = parse_wttj_html(await page.content())
+    return {**job, "_validators": _validators(response.headers) if response else {}}
 
-    # 3) Chercher le JSON-LD JobPosting
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "fr-FR,fr;q=0.9"},
+            timeout=WTTJ_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=WTTJ_HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=WTTJ_HTTP_MAX_CONNECTIONS),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def fetch_wttj_job_http(url: str):
+    """
+    Voie rapide : GET du HTML serveur et parse du JSON-LD, sans navigateur.
+    Retourne None (→ repli Playwright) si la page ne répond pas, si son JSON-LD est
+    inexploitable ou si un champ requis manque.
+    """
+    try:
+        response = await get_http_client().get(url)
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        print("⚠️ Voie HTTP WTTJ indisponible :", e)
+        return None
+    try:
+        soup = BeautifulSoup(response.text, "html.parser")
+        job = parse_job_posting_ld(soup)
+        if not all(job[field] for field in WTTJ_REQUIRED_FIELDS):
+            return None
+        job = _complete_wttj_job(soup, job)
+    except Exception as e:
+        # JSON-LD de forme inattendue (champ non textuel, jobLocation sans dict…) : repli Playwright
+        print("⚠️ JSON-LD WTTJ inexploitable par la voie HTTP :", e)
+        return None
+    return {**job, "_validators": _validators(response.headers)}
+
+
+def _validators(headers) -> dict:
+    return {"etag": headers.get("etag"), "last_modified": headers.get("last-modified")}
+
+
+def is_complete_job(job: dict) -> bool:
+    """
+    False pour une extraction dégradée (champ requis vide ou valeur par défaut) : à ne pas cacher.
+    """
+    return all(job.get(field) and job[field] != PLACEHOLDERS[field] for field in CACHE_REQUIRED_FIELDS)
+
+
+async def is_unmodified(url: str, etag: str = None, last_modified: str = None) -> bool:
+    """
+    Requête conditionnelle (If-None-Match / If-Modified-Since) : True si la page n'a pas changé (304).
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    response = await get_http_client().get(url, headers=headers)
+    return response.status_code == 304
+
+
+def _record_tier(tier: str, start: float):
+    tier_stats[tier]["count"] += 1
+    tier_stats[tier]["seconds"] += time.perf_counter() - start
+
+
+def parse_job_posting_ld(soup) -> dict:
+    """
+    Champs tirés du <script type="application/ld+json"> JobPosting (None si absents) :
+    {"title", "company", "location", "description"}.
+    """
     title = company = location = None
     description_text = None
 
@@ -130,6 +291,27 @@ async def extract_wttj_job(page, url):
                 description_text = BeautifulSoup(description_html, "html.parser").get_text(separator="\n", strip=True)
             break
 
+    return {"title": title or None, "company": company or None,
+            "location": location or None, "description": description_text or None}
+
+
+def parse_wttj_html(html: str) -> dict:
+    """
+    Extrait l'offre d'une page WTTJ (HTML serveur ou rendu par Playwright) :
+    JSON-LD d'abord, puis fallback sur le DOM « visuel ».
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    # 3) Chercher le JSON-LD JobPosting
+    return _complete_wttj_job(soup, parse_job_posting_ld(soup))
+
+
+def _complete_wttj_job(soup, job: dict) -> dict:
+    """
+    Complète les champs absents du JSON-LD depuis le DOM et applique les valeurs par défaut.
+    """
+    title, company, location = job["title"], job["company"], job["location"]
+    description_text = job["description"]
+
     # 4) Si certains champs manquent, fallback sur le DOM « visuel »
     if not title:
         h1 = soup.find("h1")
@@ -180,47 +362,41 @@ async def extract_wttj_job(page, url):
 
     # Si vraiment on n’a rien trouvé, on renvoie un message par défaut
     if not description_text:
-        description_text = "(Description non trouvée)"
+        description_text = PLACEHOLDERS["description"]
 
     return {
-        "title": title or "(Titre non trouvé)",
-        "company": company or "(Entreprise non trouvée)",
-        "location": location or "(Localisation non trouvée)",
+        "title": title or PLACEHOLDERS["title"],
+        "company": company or PLACEHOLDERS["company"],
+        "location": location or PLACEHOLDERS["location"],
         "description": description_text
     }
 
 
 
 async def extract_job_posting(url: str) -> dict:
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36"
-            )
-        )
+    start = time.perf_counter()
+    if "welcometothejungle.com" in url:
+        job = await fetch_wttj_job_http(url)
+        if job is not None:
+            _record_tier("http", start)
+            return {**job, "tier": "http"}
+        tier_stats["http_fallbacks"] += 1
+
+    if "linkedin.com" in url:
+        # Contextes LinkedIn à part : ils portent le cookie li_at
+        extract, kind, cookies = extract_linkedin_job, "linkedin", LINKEDIN_COOKIES
+    elif "welcometothejungle.com" in url:
+        extract, kind, cookies = extract_wttj_job, "default", None
+    else:
+        return {"error": "Site non supporté."}
 
-        # Si c’est un lien LinkedIn, on peut injecter un cookie li_at
-        if "linkedin.com" in url:
-            await context.add_cookies([{
-                "name": "li_at",
-                "value": LI_AT,
-                "domain": ".linkedin.com",
-                "path": "/",
-                "secure": True,
-                "httpOnly": True,
-                "sameSite": "Lax"
-            }])
-
-        page = await context.new_page()
-
-        if "linkedin.com" in url:
-            job = await extract_linkedin_job(page, url)
-        elif "welcometothejungle.com" in url:
-            job = await extract_wttj_job(page, url)
-        else:
-            job = {"error": "Site non supporté."}
-
-        await browser.close()
-        return job
+    for attempt in range(2):
+        try:
+            async with browser_pool.page(kind, cookies) as page:
+                job = await extract(page, url)
+            _record_tier("playwright", start)
+            return {**job, "tier": "playwright"}
+        except Exception:
+            # Navigateur planté en cours de route : une seconde chance sur un navigateur relancé
+            if attempt or browser_pool.healthy():
+                raise
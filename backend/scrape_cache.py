@@ -0,0 +1,150 @@
+# """
+# scrape_cache.py – Cache des offres extraites, partagé par /scrape et /extract_job.
+# - Clé : URL canonique (schéma et hôte en minuscules, sans fragment, sans paramètres de
+#   suivi utm_*, gclid, fbclid, trk…, paramètres restants triés).
+# - Une offre reste fraîche SCRAPE_CACHE_TTL_SECONDS ; au-delà de SCRAPE_CACHE_MAX_ENTRIES
+#   entrées, les moins récemment lues sont supprimées (LRU).
+# - Single-flight : des requêtes simultanées pour la même URL attendent le même scraping
+#   (un seul navigateur lancé) au lieu d'en démarrer chacune un.
+# - Une entrée expirée qui a un ETag ou un Last-Modified est revalidée par une requête
+#   conditionnelle ; un 304 la prolonge sans re-scraper.
+# - Les réponses d'erreur ({"error": …}), les exceptions et les offres refusées par
+#   `cacheable` (extraction dégradée : titre ou description introuvables) ne sont jamais
+#   mises en cache ; elles sont renvoyées à l'appelant sans être servies aux suivants.
+# """
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+SCRAPE_CACHE_TTL_SECONDS = int(os.getenv("SCRAPE_CACHE_TTL_SECONDS", "3600"))
+SCRAPE_CACHE_MAX_ENTRIES = int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", "500"))
+
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "dclid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl",
+    "ref", "ref_src", "referer", "referrer", "trk", "trkinfo", "trackingid",
+    "refid", "lipi", "midtoken", "midsig", "ebp", "originalsubdomain",
+}
+
+
+def canonical_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+class ScrapeCache:
+    """
+    fetch(url) → dict : extraction complète (peut contenir "_validators": {"etag", "last_modified"}).
+    is_unmodified(url, etag, last_modified) → bool : requête conditionnelle (True si 304).
+    cacheable(job) → bool : False pour une offre à ne pas garder (extraction incomplète).
+    """
+
+    def __init__(self, fetch, is_unmodified=None, cacheable=None, ttl_seconds=SCRAPE_CACHE_TTL_SECONDS,
+                 max_entries=SCRAPE_CACHE_MAX_ENTRIES):
+        self.fetch = fetch
+        self.is_unmodified = is_unmodified
+        self.cacheable = cacheable
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.shared = 0
+        self.uncacheable = 0
+
+    def cached(self, url: str):
+        """
+        Offre encore fraîche en cache (copie, "cache": "hit"), ou None ; ne lance aucun scraping.
+        """
+        key = canonical_url(url)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry["expires_at"]:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return {**entry["job"], "cache": "hit"}
+
+    def in_flight(self, url: str) -> bool:
+        """
+        True si un scraping de cette URL est déjà en cours (get() le rejoindra).
+        """
+        return canonical_url(url) in self._inflight
+
+    async def get(self, url: str) -> dict:
+        """
+        Retourne l'offre (copie) avec "cache" : "hit", "revalidated", "miss" ou "shared".
+        """
+        job = self.cached(url)
+        if job is not None:
+            return job
+
+        key = canonical_url(url)
+        entry = self._entries.get(key)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+            job, _ = await asyncio.shield(task)
+            return {**job, "cache": "shared"}
+
+        # Le scraping tourne dans sa propre tâche : si le premier demandeur se déconnecte,
+        # ceux qui attendent la même URL reçoivent quand même le résultat
+        task = asyncio.create_task(self._refresh(key, url, entry))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        job, status = await asyncio.shield(task)
+        return {**job, "cache": status}
+
+    async def _refresh(self, key: str, url: str, entry: dict) -> tuple:
+        if entry is not None and self.is_unmodified is not None and (entry["etag"] or entry["last_modified"]):
+            try:
+                unmodified = await self.is_unmodified(url, entry["etag"], entry["last_modified"])
+            except Exception as e:
+                print("⚠️ Revalidation impossible :", e)
+                unmodified = False
+            if unmodified:
+                entry["expires_at"] = time.monotonic() + self.ttl_seconds
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                self.revalidated += 1
+                return entry["job"], "revalidated"
+
+        self.misses += 1
+        job = dict(await self.fetch(url))
+        validators = job.pop("_validators", None) or {}
+        if job.get("error"):
+            return job, "miss"
+        if self.cacheable is not None and not self.cacheable(job):
+            self.uncacheable += 1
+            return job, "miss"
+        self._entries[key] = {
+            "job": job,
+            "expires_at": time.monotonic() + self.ttl_seconds,
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return job, "miss"
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "shared": self.shared,
+            "uncacheable": self.uncacheable,
+        }
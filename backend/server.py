@@ -1,61 +1,118 @@
 # """
 # server.py – Serveur FastAPI pour l’entretien vocal et le backend IA.
+# - /extract_jobs (POST) :
+#     • Reçoit {"urls": [...], "concurrency": n facultatif} (au plus BULK_MAX_URLS).
+#     • Extrait les offres en parallèle (bulk_extract : concurrence bornée, politesse par site, cache)
+#       et renvoie une ligne NDJSON par URL dès qu'elle est prête, {"index", "url", …} ou {"index", "url", "error"}.
 # - /context (POST) :
-#     • Reçoit en JSON : { "cv_text", "offer_text", "analysis_text", "updated_cv_text" }.
-#     • Stocke ces données dans des variables globales ou en session.
-#     • Réinitialise conversation_history et conversation_state.
-# - /reset (GET) :
-#     • Réinitialise l’historique de l’entretien (questions/réponses) côté serveur.
-#     • Remet conversation_state à « questions » et num_question à 0.
+#     • Reçoit en JSON : { "cv", "offer", "analysis", "updated" }.
+#     • Crée une nouvelle session d’entretien (session_store) et renvoie son session_id.
+# - /reset (POST) :
+#     • Réinitialise l’historique de l’entretien (questions/réponses) de la session.
+#     • Remet l’état de la session à « questions » et num_question à 0.
 # - /transcribe (POST) :
-#     • Reçoit un fichier audio (UploadFile).
-#     • Sauvegarde temporairement l’audio WAV/MP3.
-#     • Convertit en WAV mono 16 kHz (ffmpeg).
-#     • Utilise Whisper (openai.whisper) pour transcrire l’audio en texte.
+#     • Reçoit un fichier audio (UploadFile) et le session_id (champ de formulaire).
+#     • Décode l’audio en mémoire (ffmpeg stdin/stdout) en signal mono 16 kHz float32, sans fichier temporaire.
+#     • Retire les silences de début/fin et les longues pauses (VAD, audio.trim_silence).
+#     • Transcrit l’audio en texte avec le moteur STT configuré (openai-whisper ou faster-whisper), dans le pool de transcription.
+#     • Répond 503 + Retry-After si la file de transcription est pleine.
 #     • Construit un prompt contextualisé pour Mistral (CV, offre, analyse, CV modifié).
 #     • Si conversation_state == “questions” et num_question < 3 :
 #     #     • Demander à Mistral de poser la n+1-ème question RH.
 #     #   Sinon, passer en mode “bilan” pour générer un feedback final.
-#     • Convertit la réponse Mistral en MP3 via edge-tts (par segments de 600 caractères si nécessaire).
-#     • Supprime les fichiers temporaires et renvoie {"audio_url", "text"} au front-end.
+#     • Lance en tâche de fond la synthèse MP3 de la réponse Mistral (edge_tts, phrases synthétisées en parallèle).
+#     • Renvoie aussitôt {"audio_url", "text", "transcription", "vad_removed_seconds"} au front-end.
+#     • Avec stream=true, n’attend pas la réponse Mistral : le flux de tokens est découpé en phrases
+#       envoyées à la synthèse au fil de l’eau, et audio_url diffuse l’audio dès la première phrase
+#       ("text" vaut alors null).
+# - /ws/transcribe?session_id=… (WebSocket) :
+#     • Reçoit les morceaux MediaRecorder (binaire) pendant que le candidat parle.
+#     • Transcrit des fenêtres croissantes et renvoie {"type": "partial", "text"} au fil de l’eau.
+#     • Au message texte "stop", ne transcrit que la fin non encore figée, lance le tour
+#       comme /transcribe et renvoie {"type": "final", "audio_url", "text", "transcription", …}.
+# - /transcribe/stats (GET) :
+#     • Expose la profondeur de la file de transcription, les temps d’attente
+#       et le cumul de secondes de silence retirées par la VAD.
+# - /cleanup_temp (POST) :
+#     • Lance immédiatement un passage du nettoyage (janitor.py), aussi exécuté en tâche de fond.
+# - /cleanup_temp/stats (GET) :
+#     • Volume actuel des fichiers générés et cumul des suppressions (par âge / par budget disque).
 # - /audio/{filename} (GET) :
-#     • Sert un fichier MP3 généré (pour que la balise <audio> puisse le lire).
+#     • Si la synthèse est en cours, diffuse le MP3 en flux (chunked) au fil de la synthèse.
+#     • Sinon, sert le fichier MP3 généré ou, pour tts_<sha256>.mp3, le cache TTS (pour que la balise <audio> puisse le lire).
+# - /tts/stats (GET) :
+#     • Compteurs hits / misses / évictions et taille du cache TTS.
+# - /scrape/stats (GET) :
+#     • État du navigateur partagé (browser_pool) : relances, contextes, pages ouvertes / en attente.
+#     • Nombre et durée cumulée des extractions par voie (HTTP rapide / Playwright) et replis.
+#     • Cache des offres (scrape_cache) : hits, revalidations 304, scrapings partagés.
+# - /metrics (GET) :
+#     • Format texte Prometheus : histogrammes de latence, délai du premier token et tokens
+#       (prompt / complétion) des appels Mistral, plus les statistiques ci-dessus en jauges.
 # """
 
 # Middleware CORS pour autoriser localhost:8501 (Streamlit) à appeler fastapi (sur le port 8000).
-# shared_context regroupe CV, offre, analyse, CV modifié, partagé entre /context et /transcribe.
-# conversation_history stocke l’historique Q/R coté serveur.
-# conversation_state et num_question gèrent la logique “3 questions” puis “bilan”.
-# Whisper est chargé à chaque appel, mais on peut optimiser en le chargeant une seule fois au démarrage.
-# edge-tts découpe le texte pour rester <600 caractères (limite du service).
-# Les fichiers temporaires sont systématiquement nettoyés (sécurité, espace disque).
+# Chaque session (session_store.InterviewSession) regroupe CV, offre, analyse, CV modifié,
+# l’historique Q/R et l’état “3 questions” puis “bilan” ; son verrou sérialise les tours d’un même candidat.
+# Le moteur STT (stt_engines.py, STT_ENGINE) est chargé une seule fois et tourne dans un pool borné (transcription.py) pour ne pas bloquer la boucle asyncio.
+# La réponse est découpée en phrases (tts.split_sentences) : pas de troncature, et la lecture démarre dès la première phrase.
+# Les phrases et réponses déjà synthétisées (ex. la transition vers le bilan) sont relues depuis le cache TTS (tts.TTSCache).
+# Les MP3 générés sont balayés en tâche de fond par âge et par budget disque (janitor.py).
+# /scrape et /extract_job partagent un Chromium lancé une fois dans le lifespan (browser_pool.py),
+# derrière un cache par URL canonique qui fusionne les demandes simultanées (scrape_cache.py).
 
 
 
 
-from playwright_scraper import extract_job_posting 
+from playwright_scraper import (
+    browser_pool, close_http_client, extract_job_posting, is_complete_job, is_unmodified, tier_stats,
+)
+from scrape_cache import ScrapeCache
+from bulk_extract import BULK_CONCURRENCY, BULK_MAX_URLS, extract_many
 from fastapi import FastAPI, UploadFile, File, Request
-from fastapi.responses import FileResponse
+from fastapi import Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Request
+import asyncio
+import json
 import uuid
-import whisper
 import os
-import subprocess
 from mistralai import Mistral
 from dotenv import load_dotenv
-import time
-import glob
+from contextlib import asynccontextmanager
+from janitor import TempJanitor
+from session_store import SessionStore
+from telemetry import llm_telemetry, render_metrics
+from audio import AudioDecodeError
+from transcription import IncrementalTranscript, TranscriptionPool, TranscriptionQueueFull, transcribe_bytes
+from tts import SpeechJobRegistry, TTSCache, sentences_from_tokens
 
 
 
 load_dotenv()
 
-model = whisper.load_model("base")
+transcriber = TranscriptionPool()
+tts_cache = TTSCache()
+speech_jobs = SpeechJobRegistry(cache=tts_cache)
 mistral = Mistral(api_key=os.getenv("MISTRAL_API_KEY"))
-ffmpeg_exec = os.getenv("FFMPEG_PATH", "ffmpeg")
+MISTRAL_MODEL = "mistral-large-latest"
+janitor = TempJanitor()
+scrape_cache = ScrapeCache(fetch=extract_job_posting, is_unmodified=is_unmodified, cacheable=is_complete_job)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    janitor.start()
+    await browser_pool.start()
+    yield
+    await browser_pool.stop()
+    await close_http_client()
+    await janitor.stop()
+    transcriber.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.post("/scrape")
@@ -66,7 +123,7 @@ async def scrape_offer(request: Request):
         return {"error": "URL manquante"}
     
     try:
-        result = await extract_job_posting(url)
+        result = await scrape_cache.get(url)
         return result
     except Exception as e:
         return {"error": f"Erreur Playwright : {str(e)}"}
@@ -75,21 +132,38 @@ from fastapi import Request
 
 @app.post("/extract_job")
 async def extract_job(request: Request):
-    from playwright_scraper import extract_job_posting
-    import asyncio
-
     data = await request.json()
     url = data.get("url")
     if not url:
         return {"error": "URL manquante"}
     try:
-        job = await extract_job_posting(url)
+        job = await scrape_cache.get(url)
         return job
     except Exception as e:
         return {"error": str(e)}
 
 
 
+@app.post("/extract_jobs")
+async def extract_jobs(request: Request):
+    data = await request.json()
+    urls = [url.strip() for url in data.get("urls", []) if isinstance(url, str) and url.strip()]
+    if not urls:
+        return JSONResponse(status_code=400, content={"error": "Liste d'URL manquante"})
+    if len(urls) > BULK_MAX_URLS:
+        return JSONResponse(status_code=400, content={"error": f"Au plus {BULK_MAX_URLS} URL par requête"})
+    try:
+        concurrency = min(int(data.get("concurrency") or BULK_CONCURRENCY), BULK_CONCURRENCY)
+    except (TypeError, ValueError):
+        return JSONResponse(status_code=400, content={"error": "concurrency doit être un entier"})
+
+    async def lines():
+        async for result in extract_many(urls, scrape_cache, concurrency):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -98,142 +172,250 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-shared_context = {}
-conversation_history = []
-conversation_state = {
-    "num_question": 0,
-    "mode": "questions"
-}
-_MAX_AGE_SECONDS = 600
+sessions = SessionStore()
+vad_stats = {"turns": 0, "audio_seconds": 0.0, "removed_seconds": 0.0}
 
 
+def _session_not_found():
+    return JSONResponse(status_code=404, content={"error": "Session d'entretien inconnue ou expirée."})
 
-def delete_old_temp_files():
-    """
-    Supprime tous les fichiers temp_*.wav à la racine et
-    static/output_*.mp3 de plus de 10 minutes.
-    """
-    now = time.time()
-       # 1) temp_*.wav à la racine
-    for wav_file in glob.glob("temp_*.wav"):
-        try:
-            if now - os.path.getmtime(wav_file) > _MAX_AGE_SECONDS:
-                os.remove(wav_file)
-        except FileNotFoundError:
-            pass
-
-    # 2) output_*.mp3 dans static/
-    for mp3_file in glob.glob(os.path.join("static", "output_*.mp3")):
-        try:
-            if now - os.path.getmtime(mp3_file) > _MAX_AGE_SECONDS:
-                os.remove(mp3_file)
-        except FileNotFoundError:
-            pass
-
-    # 3) output_*.wav à la racine
-    for wav_file in glob.glob("output_*.wav"):
-        try:
-            if now - os.path.getmtime(wav_file) > _MAX_AGE_SECONDS:
-                os.remove(wav_file)
-        except FileNotFoundError:
-            pass
-
-    # 4) converted_*.wav à la racine
-    for wav_file in glob.glob("converted_*.wav"):
-        try:
-            if now - os.path.getmtime(wav_file) > _MAX_AGE_SECONDS:
-                os.remove(wav_file)
-        except FileNotFoundError:
-            pass
 
 @app.post("/context")
 async def store_context(request: Request):
-    global shared_context, conversation_history, conversation_state
-    shared_context = await request.json()
-    conversation_history = []
-    conversation_state = {"num_question": 0, "mode": "questions"}
-    return {"status": "ok"}
+    session = sessions.create(await request.json())
+    return {"status": "ok", "session_id": session.session_id}
 
 @app.post("/reset")
-async def reset_history():
-    global conversation_history, conversation_state
-    conversation_history = []
-    conversation_state = {"num_question": 0, "mode": "questions"}
+async def reset_history(session_id: str):
+    session = sessions.get(session_id)
+    if session is None:
+        return _session_not_found()
+    async with session.lock:
+        session.reset()
     return {"status": "history cleared"}
 
-@app.post("/transcribe")
-async def transcribe_audio(audio: UploadFile = File(...)):
-    
-    temp_filename = f"temp_{uuid.uuid4().hex}.wav"
-    converted_filename = os.path.abspath(f"static/output_{uuid.uuid4().hex}.mp3")
-
-    with open(temp_filename, "wb") as f:
-        f.write(await audio.read())
 
-    wav_filename = converted_filename.replace(".mp3", ".wav")
-    subprocess.run([
-        ffmpeg_exec, "-y", "-i", temp_filename,
-        "-ar", "16000", "-ac", "1", "-f", "wav", wav_filename
-    ], check=True)
-
-    transcription = model.transcribe(wav_filename)["text"]
-    print("🖍️ Transcription :", transcription)
-
-    global conversation_history, conversation_state
-
-    contextual_prompt = f"""
+def _contextual_prompt(context: dict) -> str:
+    return f"""
 Tu es un recruteur RH simulant un entretien d'embauche.
 
 Contexte :
-- CV : {shared_context.get("cv", "")[:1000]}
-- Offre : {shared_context.get("offer", "")[:1000]}
-- Analyse IA : {shared_context.get("analysis", "")[:1000]}
-- CV modifié : {shared_context.get("updated", "")[:1000]}
+- CV : {context.get("cv", "")[:1000]}
+- Offre : {context.get("offer", "")[:1000]}
+- Analyse IA : {context.get("analysis", "")[:1000]}
+- CV modifié : {context.get("updated", "")[:1000]}
 """
 
-    messages = [{"role": "system", "content": contextual_prompt}] + conversation_history
+
+async def _mistral_tokens(messages: list, operation: str):
+    # Le dernier événement du flux porte `usage` (tokens du prompt et de la réponse)
+    timer = llm_telemetry.timer("mistral", MISTRAL_MODEL, operation)
+    usage = None
+    try:
+        stream = await mistral.chat.stream_async(model=MISTRAL_MODEL, messages=messages)
+        async for event in stream:
+            usage = event.data.usage or usage
+            content = event.data.choices[0].delta.content if event.data.choices else None
+            if content:
+                timer.first_token()
+                yield content
+    except Exception:
+        timer.done(usage, error=True)
+        raise
+    timer.done(usage)
+
+
+async def _answer_tokens(session, transcription: str):
+    """
+    Fait avancer l’entretien d’un tour (question suivante ou bilan) et produit
+    la réponse du recruteur au fil des tokens Mistral.
+    Doit être consommé entièrement avec session.lock détenu.
+    """
+    contextual_prompt = _contextual_prompt(session.context)
+    history = session.history
+    state = session.state
+
+    messages = [{"role": "system", "content": contextual_prompt}] + history
     messages.append({"role": "user", "content": transcription})
 
-    conversation_history.append({"role": "user", "content": transcription})
+    history.append({"role": "user", "content": transcription})
 
-    if conversation_state["mode"] == "questions":
-        if conversation_state["num_question"] < 3:
+    if state["mode"] == "questions":
+        if state["num_question"] < 3:
             messages.append({
                 "role": "system",
-                "content": f"Pose une question RH pertinente, adaptée au poste, sans commenter. C'est la question {conversation_state['num_question'] + 1} sur 3."
+                "content": f"Pose une question RH pertinente, adaptée au poste, sans commenter. C'est la question {state['num_question'] + 1} sur 3."
             })
-            response = mistral.chat.complete(model="mistral-large-latest", messages=messages)
-            answer = response.choices[0].message.content.strip()
-            conversation_state["num_question"] += 1
-            conversation_history.append({"role": "assistant", "content": answer})
+            parts = []
+            async for token in _mistral_tokens(messages, "question"):
+                parts.append(token)
+                yield token
+            state["num_question"] += 1
+            history.append({"role": "assistant", "content": "".join(parts).strip()})
         else:
-            conversation_state["mode"] = "bilan"
-            answer = "Merci pour vos réponses. Voici une synthèse vocale de votre entretien."
+            state["mode"] = "bilan"
+            yield "Merci pour vos réponses. Voici une synthèse vocale de votre entretien."
     else:
         # Synthèse finale
         bilan_prompt = contextual_prompt + "\nVoici les réponses du candidat :\n"
-        for msg in conversation_history:
+        for msg in history:
             if msg["role"] == "user":
                 bilan_prompt += f"- {msg['content']}\n"
         bilan_prompt += "\nDonne un retour RH global en 4 phrases maximum."
-        response = mistral.chat.complete(model="mistral-large-latest", messages=[{"role": "system", "content": bilan_prompt}])
-        answer = response.choices[0].message.content.strip()
-        conversation_state["mode"] = "fini"
+        async for token in _mistral_tokens([{"role": "system", "content": bilan_prompt}], "bilan"):
+            yield token
+        state["mode"] = "fini"
+
+
+async def _locked_answer_tokens(session, transcription: str):
+    # Le verrou reste détenu par la synthèse en tâche de fond jusqu’au dernier token
+    async with session.lock:
+        async for token in _answer_tokens(session, transcription):
+            yield token
+    sessions.enforce_limits()
+
 
-    # Nettoyage texte pour edge-tts
-    tts_text = answer.replace('"', "'").replace("**", "").replace("\n", " ").strip()[:600]
-    tts_command = f'edge-tts --text "{tts_text}" --write-media "{converted_filename}"'
-    print("🔊 Commande TTS:", tts_command)
-    os.system(tts_command)
+def _record_vad(result: dict):
+    vad_stats["turns"] += 1
+    vad_stats["audio_seconds"] += result["audio_seconds"]
+    vad_stats["removed_seconds"] += result["vad_removed_seconds"]
 
-    os.remove(temp_filename)
-    os.remove(wav_filename)
 
-    return {"audio_url": f"http://localhost:8000/audio/{os.path.basename(converted_filename)}", "text": answer}
+async def _start_turn(session, transcription: str, stream: bool) -> dict:
+    """
+    Lance la réponse du recruteur et sa synthèse vocale ; retourne {"audio_url", "text"}.
+    """
+    if stream:
+        # Mode pipeline : les phrases partent en synthèse pendant que Mistral génère la suite
+        audio_filename = f"output_{uuid.uuid4().hex}.mp3"
+        speech_jobs.start(audio_filename, sentences_from_tokens(_locked_answer_tokens(session, transcription)))
+        return {"audio_url": f"http://localhost:8000/audio/{audio_filename}", "text": None}
+
+    answer = "".join([token async for token in _locked_answer_tokens(session, transcription)]).strip()
+    # Réponse connue : MP3 adressé par contenu, servi directement depuis le cache s'il existe déjà
+    audio_filename = speech_jobs.start_cached(answer)
+    return {"audio_url": f"http://localhost:8000/audio/{audio_filename}", "text": answer}
+
+
+@app.post("/transcribe")
+async def transcribe_audio(audio: UploadFile = File(...), session_id: str = Form(...), stream: bool = Form(False)):
+    session = sessions.get(session_id)
+    if session is None:
+        return _session_not_found()
+
+    try:
+        result = await transcriber.submit(transcribe_bytes, await audio.read())
+    except AudioDecodeError:
+        return JSONResponse(status_code=400, content={"error": "Fichier audio illisible."})
+    except TranscriptionQueueFull as e:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+            content={"error": "Serveur de transcription saturé, réessayez plus tard."},
+        )
+    transcription = result["text"]
+    _record_vad(result)
+    print("🖍️ Transcription :", transcription, f"({result['vad_removed_seconds']:.1f} s de silence retirées)")
+
+    reply = await _start_turn(session, transcription, stream)
+    return {**reply, "transcription": transcription, "vad_removed_seconds": result["vad_removed_seconds"]}
+
+
+@app.websocket("/ws/transcribe")
+async def transcribe_ws(websocket: WebSocket, session_id: str, stream: bool = True):
+    await websocket.accept()
+    session = sessions.get(session_id)
+    if session is None:
+        await websocket.send_json({"type": "error", "error": "Session d'entretien inconnue ou expirée."})
+        await websocket.close()
+        return
+
+    transcript = IncrementalTranscript(transcriber)
+    partial_task = None
+
+    async def send_partial():
+        text = await transcript.partial()
+        if text is not None:
+            await websocket.send_json({"type": "partial", "text": text})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                transcript.append(message["bytes"])
+                if (partial_task is None or partial_task.done()) and transcript.partial_due():
+                    partial_task = asyncio.create_task(send_partial())
+            elif message.get("text") == "stop":
+                break
+
+        # La partie figée pendant la prise de parole n'est pas retranscrite : seule la fin reste à traiter
+        if partial_task is not None:
+            await partial_task
+        try:
+            result = await transcript.final()
+        except AudioDecodeError:
+            await websocket.send_json({"type": "error", "error": "Fichier audio illisible."})
+            return
+        except TranscriptionQueueFull as e:
+            await websocket.send_json({"type": "error", "error": "Serveur de transcription saturé, réessayez plus tard.",
+                                       "retry_after": e.retry_after})
+            return
+        _record_vad(result)
+        print("🖍️ Transcription :", result["text"], f"(fin traitée : {result['tail_seconds']:.1f} s)")
+
+        reply = await _start_turn(session, result["text"], stream)
+        await websocket.send_json({"type": "final", **reply, "transcription": result["text"],
+                                   "tail_seconds": result["tail_seconds"],
+                                   "vad_removed_seconds": result["vad_removed_seconds"]})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if partial_task is not None:
+            partial_task.cancel()
+
+@app.get("/transcribe/stats")
+def transcription_stats():
+    return {**transcriber.stats(), "vad": {k: round(v, 2) for k, v in vad_stats.items()}}
+
+@app.post("/cleanup_temp")
+async def cleanup_temp():
+    return await asyncio.to_thread(janitor.sweep)
+
+@app.get("/cleanup_temp/stats")
+def cleanup_stats():
+    return janitor.stats()
+
+@app.get("/tts/stats")
+def tts_stats():
+    return tts_cache.stats()
+
+@app.get("/scrape/stats")
+def scrape_stats():
+    return {"browser": browser_pool.stats(), "tiers": tier_stats, "cache": scrape_cache.stats()}
+
+@app.get("/metrics")
+def metrics():
+    sections = {
+        "transcription": transcriber.stats(),
+        "vad": vad_stats,
+        "tts_cache": tts_cache.stats(),
+        "janitor": janitor.stats(),
+        "sessions": sessions.stats(),
+        "browser": browser_pool.stats(),
+        "scrape_tiers": tier_stats,
+        "scrape_cache": scrape_cache.stats(),
+    }
+    return PlainTextResponse(render_metrics(llm_telemetry, sections), media_type="text/plain; version=0.0.4")
 
 @app.get("/audio/{filename}")
 def serve_audio(filename: str):
-    path = f"static/{filename}"
+    job = speech_jobs.get(filename)
+    if job is not None:
+        return StreamingResponse(job.iter_chunks(), media_type="audio/mpeg")
+    path = tts_cache.path(filename) if filename.startswith("tts_") else f"static/{filename}"
     if not os.path.exists(path):
         return {"error": "Fichier audio introuvable."}
     return FileResponse(path, media_type="audio/mpeg", filename=filename)
@@ -0,0 +1,115 @@
+# """
+# session_store.py – Stockage en mémoire des sessions d'entretien vocal.
+# - Chaque appel à /context crée une session identifiée par un session_id.
+# - Une session contient le contexte (CV, offre, analyse, CV modifié),
+#   l'historique Q/R et l'état de la conversation (questions puis bilan).
+# - Chaque session possède son propre verrou asyncio : deux tours d'un même
+#   candidat sont sérialisés, deux candidats différents avancent en parallèle.
+# - Les sessions expirent après SESSION_TTL_SECONDS d'inactivité et les moins
+#   récemment utilisées sont évincées au-delà de SESSION_MAX_COUNT sessions
+#   ou de SESSION_MAX_BYTES octets de texte stocké.
+# """
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "200"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+class InterviewSession:
+    """
+    État d'un entretien : contexte, historique Q/R et avancement (mode, num_question).
+    """
+
+    def __init__(self, session_id: str, context: dict):
+        self.session_id = session_id
+        self.context = context
+        self.lock = asyncio.Lock()
+        self.last_access = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        self.history = []
+        self.state = {"num_question": 0, "mode": "questions"}
+
+    def touch(self):
+        self.last_access = time.monotonic()
+
+    def size_bytes(self) -> int:
+        """
+        Estimation de l'empreinte mémoire : taille UTF-8 du contexte et de l'historique.
+        """
+        size = sum(len(str(v).encode("utf-8")) for v in self.context.values())
+        size += sum(len(msg["content"].encode("utf-8")) for msg in self.history)
+        return size
+
+
+class SessionStore:
+    """
+    Sessions indexées par session_id, ordonnées de la moins à la plus récemment utilisée.
+    """
+
+    def __init__(self, ttl_seconds=SESSION_TTL_SECONDS, max_count=SESSION_MAX_COUNT, max_bytes=SESSION_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+
+    def create(self, context: dict) -> InterviewSession:
+        session = InterviewSession(uuid.uuid4().hex, context)
+        self._sessions[session.session_id] = session
+        self.enforce_limits()
+        return session
+
+    def get(self, session_id: str):
+        """
+        Retourne la session (et la marque comme récemment utilisée), ou None si inconnue/expirée.
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if self._is_expired(session) and not session.lock.locked():
+            del self._sessions[session_id]
+            return None
+        session.touch()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def enforce_limits(self):
+        """
+        Supprime les sessions expirées puis évince par ordre LRU tant que
+        le nombre de sessions ou la mémoire estimée dépasse les plafonds.
+        Une session dont le verrou est pris (tour en cours) n'est jamais évincée.
+        """
+        for session_id, session in list(self._sessions.items()):
+            if self._is_expired(session) and not session.lock.locked():
+                del self._sessions[session_id]
+
+        total_bytes = sum(s.size_bytes() for s in self._sessions.values())
+        for session_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_count and total_bytes <= self.max_bytes:
+                break
+            if session.lock.locked():
+                continue
+            total_bytes -= session.size_bytes()
+            del self._sessions[session_id]
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": sum(s.size_bytes() for s in self._sessions.values()),
+            "max_sessions": self.max_count,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def _is_expired(self, session: InterviewSession) -> bool:
+        return time.monotonic() - session.last_access > self.ttl_seconds
@@ -0,0 +1,87 @@
+# """
+# stt_engines.py – Moteurs de reconnaissance vocale interchangeables.
+# - STT_ENGINE choisit le moteur :
+#     • "whisper"        : openai-whisper (PyTorch, fp32 sur CPU), comportement historique.
+#     • "faster-whisper" : CTranslate2, quantifié (STT_COMPUTE_TYPE, int8 par défaut),
+#                          nettement plus rapide et plus léger en RAM sur CPU.
+# - STT_MODEL_SIZE (tiny, base, small…), STT_THREADS (0 = défaut du moteur),
+#   STT_LANGUAGE (vide = détection automatique) et STT_BEAM_SIZE (1 = décodage glouton,
+#   le défaut historique d'openai-whisper) s'appliquent aux deux moteurs, pour que
+#   leurs résultats et leurs temps restent comparables.
+# - Chaque moteur expose transcribe(audio) -> {"text", "segments"} à partir d'un
+#   signal mono 16 kHz float32 (audio.decode_audio), segments = [{"start", "end", "text"}].
+# """
+
+import os
+
+STT_ENGINE = os.getenv("STT_ENGINE", "whisper")
+STT_MODEL_SIZE = os.getenv("STT_MODEL_SIZE", "base")
+STT_THREADS = int(os.getenv("STT_THREADS", "0"))
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "int8")
+STT_LANGUAGE = os.getenv("STT_LANGUAGE") or None
+STT_BEAM_SIZE = int(os.getenv("STT_BEAM_SIZE", "1"))
+
+
+class STTEngine:
+    name = ""
+    # Un même modèle peut-il servir plusieurs transcriptions simultanées (mode thread) ?
+    thread_safe = True
+
+    def transcribe(self, audio) -> dict:
+        raise NotImplementedError
+
+
+class WhisperEngine(STTEngine):
+    name = "whisper"
+    # Le décodeur pose ses hooks de kv-cache sur le modèle à chaque transcription :
+    # deux décodages simultanés sur le même modèle se mélangent leurs caches
+    thread_safe = False
+
+    def __init__(self, model_size=STT_MODEL_SIZE, threads=STT_THREADS, language=STT_LANGUAGE,
+                 beam_size=STT_BEAM_SIZE):
+        import torch
+        import whisper
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.language = language
+        self.beam_size = beam_size
+        self.model = whisper.load_model(model_size, device="cpu")
+
+    def transcribe(self, audio) -> dict:
+        # Sans beam_size, openai-whisper décode en glouton
+        options = {"beam_size": self.beam_size} if self.beam_size > 1 else {}
+        result = self.model.transcribe(audio, fp16=False, language=self.language, **options)
+        return {
+            "text": result["text"],
+            "segments": [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]],
+        }
+
+
+class FasterWhisperEngine(STTEngine):
+    name = "faster-whisper"
+
+    def __init__(self, model_size=STT_MODEL_SIZE, threads=STT_THREADS, language=STT_LANGUAGE,
+                 compute_type=STT_COMPUTE_TYPE, beam_size=STT_BEAM_SIZE):
+        from faster_whisper import WhisperModel
+
+        self.language = language
+        self.beam_size = beam_size
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=threads)
+
+    def transcribe(self, audio) -> dict:
+        segments, _ = self.model.transcribe(audio, language=self.language, beam_size=self.beam_size)
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+
+ENGINES = {
+    WhisperEngine.name: WhisperEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def load_engine(name: str = STT_ENGINE, **kwargs) -> STTEngine:
+    if name not in ENGINES:
+        raise ValueError(f"Moteur STT inconnu : {name} (attendu : {', '.join(ENGINES)})")
+    return ENGINES[name](**kwargs)
@@ -0,0 +1,176 @@
+# """
+# telemetry.py – Mesures des appels LLM (Mistral) et export au format texte Prometheus.
+# - LLMTelemetry.record() : un appel = latence totale, temps jusqu'au premier token,
+#   tokens du prompt et de la complétion (champ `usage` de la réponse), rejeux, erreur.
+# - Histogrammes par (fournisseur, modèle, opération) : llm_request_duration_seconds,
+#   llm_time_to_first_token_seconds, llm_prompt_tokens, llm_completion_tokens ;
+#   compteurs llm_requests_total, llm_errors_total, llm_retries_total.
+# - render_metrics() ajoute les statistiques déjà exposées en JSON (transcription, VAD,
+#   cache TTS, nettoyage, sessions, navigateur de scraping) sous forme de jauges, pour un seul point de collecte /metrics.
+# """
+
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+METRICS_PREFIX = "cvanalyzer"
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernier seau : +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {round(self.sum, 6)}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class CallTimer:
+    """
+    Chronomètre d'un appel en flux : first_token() au premier fragment, puis done().
+    """
+
+    def __init__(self, telemetry, provider: str, model: str, operation: str):
+        self.telemetry = telemetry
+        self.provider = provider
+        self.model = model
+        self.operation = operation
+        self.start = time.perf_counter()
+        self.ttft = None
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+
+    def done(self, usage=None, error: bool = False, retries: int = 0):
+        self.telemetry.record(
+            self.provider, self.model, self.operation,
+            seconds=time.perf_counter() - self.start, ttft=self.ttft,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            retries=retries, error=error,
+        )
+
+
+class LLMTelemetry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _get(self, key: tuple) -> dict:
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = {
+                "duration": Histogram(LATENCY_BUCKETS),
+                "ttft": Histogram(LATENCY_BUCKETS),
+                "prompt_tokens": Histogram(TOKEN_BUCKETS),
+                "completion_tokens": Histogram(TOKEN_BUCKETS),
+                "requests": 0,
+                "errors": 0,
+                "retries": 0,
+            }
+        return series
+
+    def timer(self, provider: str, model: str, operation: str) -> CallTimer:
+        return CallTimer(self, provider, model, operation)
+
+    def record(self, provider: str, model: str, operation: str, seconds: float, ttft: float = None,
+               prompt_tokens: int = None, completion_tokens: int = None, retries: int = 0, error: bool = False):
+        with self._lock:
+            series = self._get((provider, model, operation))
+            series["requests"] += 1
+            series["retries"] += retries
+            series["errors"] += int(error)
+            series["duration"].observe(seconds)
+            if ttft is not None:
+                series["ttft"].observe(ttft)
+            if prompt_tokens is not None:
+                series["prompt_tokens"].observe(prompt_tokens)
+            if completion_tokens is not None:
+                series["completion_tokens"].observe(completion_tokens)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                f"{provider}/{model}/{operation}": {
+                    "requests": s["requests"],
+                    "errors": s["errors"],
+                    "retries": s["retries"],
+                    "avg_seconds": round(s["duration"].sum / s["duration"].count, 3) if s["duration"].count else 0.0,
+                    "avg_ttft_seconds": round(s["ttft"].sum / s["ttft"].count, 3) if s["ttft"].count else 0.0,
+                    "prompt_tokens": int(s["prompt_tokens"].sum),
+                    "completion_tokens": int(s["completion_tokens"].sum),
+                }
+                for (provider, model, operation), s in self._series.items()
+            }
+
+    def render(self) -> list:
+        histograms = {
+            "duration": ("llm_request_duration_seconds", "Durée totale des appels LLM"),
+            "ttft": ("llm_time_to_first_token_seconds", "Délai avant le premier token"),
+            "prompt_tokens": ("llm_prompt_tokens", "Tokens du prompt par appel"),
+            "completion_tokens": ("llm_completion_tokens", "Tokens générés par appel"),
+        }
+        counters = {
+            "requests": ("llm_requests_total", "Appels LLM"),
+            "errors": ("llm_errors_total", "Appels LLM en erreur"),
+            "retries": ("llm_retries_total", "Rejeux d'appels LLM"),
+        }
+        lines = []
+        with self._lock:
+            series = sorted(self._series.items())
+            for field, (name, help_text) in histograms.items():
+                name = f"{METRICS_PREFIX}_{name}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for key, s in series:
+                    lines += s[field].lines(name, _labels(*key))
+            for field, (name, help_text) in counters.items():
+                name = f"{METRICS_PREFIX}_{name}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{{{_labels(*key)}}} {s[field]}" for key, s in series]
+        return lines
+
+
+def _labels(provider: str, model: str, operation: str) -> str:
+    return f'provider="{provider}",model="{model}",operation="{operation}"'
+
+
+def _gauges(prefix: str, stats: dict) -> list:
+    lines = []
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            lines += _gauges(name, value)
+        elif isinstance(value, (int, float)):
+            lines += [f"# TYPE {name} gauge", f"{name} {int(value) if isinstance(value, bool) else value}"]
+    return lines
+
+
+def render_metrics(telemetry: LLMTelemetry, sections: dict) -> str:
+    """
+    Texte d'exposition Prometheus : métriques LLM + {section: stats()} en jauges.
+    """
+    lines = telemetry.render()
+    for section, stats in sections.items():
+        lines += _gauges(f"{METRICS_PREFIX}_{section}", stats)
+    return "\n".join(lines) + "\n"
+
+
+llm_telemetry = LLMTelemetry()
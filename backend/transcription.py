@@ -0,0 +1,243 @@
+# """
+# transcription.py – Exécution de Whisper hors de la boucle asyncio.
+# - Le moteur STT (stt_engines, choisi par STT_ENGINE) est chargé une fois par processus
+#   (thread principal ou worker). En mode thread, un moteur qui n'est pas thread_safe
+#   (openai-whisper) est chargé une fois par thread du pool ; faster-whisper reste partagé.
+# - TranscriptionPool exécute les transcriptions sur un pool de threads ou de
+#   processus (TRANSCRIBE_EXECUTOR = "thread" | "process") de TRANSCRIBE_WORKERS workers.
+# - La file d'attente est bornée (TRANSCRIBE_QUEUE_SIZE) : au-delà, submit() lève
+#   TranscriptionQueueFull et le serveur répond 503 avec un en-tête Retry-After.
+# - stats() expose la profondeur de file et les temps d'attente / de traitement.
+# - IncrementalTranscript : transcription progressive d'un enregistrement reçu par
+#   morceaux (WebSocket). Les fenêtres croissantes sont transcrites pendant que le
+#   candidat parle ; les segments stables sont figés au fil de l'eau, si bien qu'à
+#   l'arrêt il ne reste que la fin de l'enregistrement à transcrire. Les partielles ne
+#   prennent qu'un worker libre : elles ne font jamais attendre ni rejeter (503) une
+#   transcription finale ou un /transcribe.
+# """
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from audio import SAMPLE_RATE, VAD_ENABLED, AudioDecodeError, decode_audio, trim_silence
+from stt_engines import ENGINES, STT_ENGINE, load_engine
+
+TRANSCRIBE_EXECUTOR = os.getenv("TRANSCRIBE_EXECUTOR", "thread")
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "2"))
+TRANSCRIBE_QUEUE_SIZE = int(os.getenv("TRANSCRIBE_QUEUE_SIZE", "8"))
+# Intervalle minimal entre deux transcriptions partielles d'un même enregistrement
+PARTIAL_INTERVAL_SECONDS = float(os.getenv("PARTIAL_INTERVAL_SECONDS", "1.5"))
+# Au-delà de cette durée non figée, les segments stables de la fenêtre sont figés
+PARTIAL_COMMIT_SECONDS = float(os.getenv("PARTIAL_COMMIT_SECONDS", "8"))
+
+# Un moteur inconnu est signalé par load_engine() au premier chargement
+SHARED_ENGINE = getattr(ENGINES.get(STT_ENGINE), "thread_safe", True)
+
+_engine = None
+_engine_lock = threading.Lock()
+_thread_engine = threading.local()
+
+
+def _get_engine():
+    global _engine
+    if not SHARED_ENGINE:
+        if getattr(_thread_engine, "engine", None) is None:
+            _thread_engine.engine = load_engine()
+        return _thread_engine.engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = load_engine()
+    return _engine
+
+
+def transcribe_bytes(data: bytes) -> dict:
+    """
+    Décode l'audio reçu en mémoire (mono 16 kHz float32), retire les silences (VAD)
+    puis le transcrit. Retourne {"text", "audio_seconds", "vad_removed_seconds"}.
+    Fonction bloquante, exécutée dans un worker du pool.
+    """
+    audio = decode_audio(data)
+    audio_seconds = len(audio) / SAMPLE_RATE
+    removed = 0.0
+    if VAD_ENABLED:
+        audio, removed = trim_silence(audio)
+    return {
+        "text": _get_engine().transcribe(audio)["text"],
+        "audio_seconds": audio_seconds,
+        "vad_removed_seconds": removed,
+    }
+
+
+def transcribe_window(data: bytes, offset_seconds: float, trim: bool = False) -> dict:
+    """
+    Décode l'enregistrement complet reçu jusqu'ici (les morceaux MediaRecorder ne sont
+    pas décodables isolément) et transcrit uniquement l'audio après offset_seconds.
+    Les timestamps des segments sont relatifs au début de la fenêtre.
+    """
+    audio = decode_audio(data)
+    window = audio[int(offset_seconds * SAMPLE_RATE):]
+    window_seconds = len(window) / SAMPLE_RATE
+    removed = 0.0
+    if trim and VAD_ENABLED:
+        window, removed = trim_silence(window)
+    result = _get_engine().transcribe(window)
+    return {
+        "text": result["text"],
+        "segments": result["segments"],
+        "audio_seconds": len(audio) / SAMPLE_RATE,
+        "window_seconds": window_seconds,
+        "vad_removed_seconds": removed,
+    }
+
+
+def _timed_call(func, *args):
+    # time.time() (et non monotonic) : comparable entre le processus serveur et un worker
+    started_at = time.time()
+    result = func(*args)
+    return started_at, time.time(), result
+
+
+class TranscriptionQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("File de transcription pleine.")
+        self.retry_after = retry_after
+
+
+class TranscriptionPool:
+    """
+    Pool borné de workers de transcription, utilisable depuis la boucle asyncio.
+    """
+
+    def __init__(self, kind=TRANSCRIBE_EXECUTOR, workers=TRANSCRIBE_WORKERS, queue_size=TRANSCRIBE_QUEUE_SIZE):
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            # Chaque thread charge son moteur à son démarrage (ou récupère le moteur partagé)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt",
+                                                initializer=_get_engine)
+            if SHARED_ENGINE:
+                _get_engine()
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.partials_skipped = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_service = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    def has_idle_worker(self) -> bool:
+        return self.in_flight < self.workers
+
+    def retry_after(self) -> int:
+        """
+        Estimation (en secondes) du temps avant qu'une place se libère dans la file.
+        """
+        avg_service = self.total_service / self.completed if self.completed else 5.0
+        return max(1, math.ceil(avg_service * (self.queue_depth + 1) / self.workers))
+
+    async def submit(self, func, *args):
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise TranscriptionQueueFull(self.retry_after())
+
+        self.in_flight += 1
+        enqueued_at = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            started_at, finished_at, result = await loop.run_in_executor(self._executor, _timed_call, func, *args)
+        finally:
+            self.in_flight -= 1
+
+        wait = max(0.0, started_at - enqueued_at)
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_service += finished_at - started_at
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "partials_skipped": self.partials_skipped,
+            "avg_wait_seconds": round(self.total_wait / self.completed, 3) if self.completed else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+            "avg_service_seconds": round(self.total_service / self.completed, 3) if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class IncrementalTranscript:
+    """
+    État de la transcription progressive d'un enregistrement envoyé par morceaux.
+    """
+
+    def __init__(self, pool: TranscriptionPool):
+        self.pool = pool
+        self.data = bytearray()
+        self.committed = []
+        self.committed_seconds = 0.0
+        self._last_partial = 0.0
+
+    def append(self, chunk: bytes):
+        self.data += chunk
+
+    def partial_due(self) -> bool:
+        return bool(self.data) and time.monotonic() - self._last_partial >= PARTIAL_INTERVAL_SECONDS
+
+    def _text(self, segments: list) -> str:
+        return "".join(self.committed + [s["text"] for s in segments]).strip()
+
+    async def partial(self):
+        """
+        Transcrit la fenêtre non figée et retourne le texte provisoire complet, ou None
+        si aucun worker n'est libre ou si le début du flux n'est pas encore décodable.
+        """
+        self._last_partial = time.monotonic()
+        if not self.pool.has_idle_worker():
+            # Les partielles sont facultatives : elles ne passent jamais dans la file d'attente
+            self.pool.partials_skipped += 1
+            return None
+        try:
+            result = await self.pool.submit(transcribe_window, bytes(self.data), self.committed_seconds)
+        except (TranscriptionQueueFull, AudioDecodeError):
+            return None
+
+        segments = result["segments"]
+        if result["window_seconds"] > PARTIAL_COMMIT_SECONDS and len(segments) > 1:
+            # Le dernier segment peut encore changer avec la suite de la phrase : on le garde ouvert
+            self.committed.extend(s["text"] for s in segments[:-1])
+            self.committed_seconds += segments[-2]["end"]
+            segments = segments[-1:]
+        return self._text(segments)
+
+    async def final(self) -> dict:
+        """
+        Transcrit la fin de l'enregistrement (après la partie figée) et retourne
+        {"text", "audio_seconds", "tail_seconds", "vad_removed_seconds"}.
+        """
+        result = await self.pool.submit(transcribe_window, bytes(self.data), self.committed_seconds, True)
+        return {
+            "text": self._text(result["segments"]),
+            "audio_seconds": result["audio_seconds"],
+            "tail_seconds": result["window_seconds"],
+            "vad_removed_seconds": result["vad_removed_seconds"],
+        }
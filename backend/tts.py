@@ -0,0 +1,345 @@
+# """
+# tts.py – Synthèse vocale en processus via la bibliothèque edge_tts.
+# - split_sentences(text) : nettoie le texte (markdown, retours ligne) et le découpe
+#   en segments courts (phrases), sans limite globale de longueur.
+# - stream_speech(segments) : synthétise les segments en parallèle (TTS_CONCURRENCY)
+#   et restitue les octets MP3 dans l'ordre du texte, au fil de l'eau.
+# - sentences_from_tokens(tokens) : regroupe un flux de tokens LLM en phrases dès
+#   qu'une fin de phrase est confirmée, pour alimenter stream_speech sans attendre
+#   la fin de la génération.
+# - SpeechJob : synthèse d'une réponse lancée en tâche de fond ; les clients lisent
+#   les morceaux déjà produits puis attendent les suivants, et le MP3 complet est
+#   écrit dans static/ (ou dans le cache) une fois terminé.
+# - TTSCache : cache disque adressé par contenu (sha256 du texte normalisé et de la
+#   voix), borné à TTS_CACHE_MAX_BYTES avec éviction LRU. Un segment ou une réponse
+#   déjà synthétisés ne repassent pas par edge-tts. hits / misses se comptent par
+#   phrase (un appel edge-tts évité ou fait), quel que soit le chemin : une réponse
+#   entière trouvée en cache compte un hit par phrase, et la relecture du MP3 par
+#   /audio ne recompte rien.
+# """
+
+import asyncio
+import glob
+import hashlib
+import os
+import re
+import unicodedata
+
+import edge_tts
+
+TTS_VOICE = os.getenv("TTS_VOICE", "fr-FR-DeniseNeural")
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+TTS_SEGMENT_MAX_CHARS = int(os.getenv("TTS_SEGMENT_MAX_CHARS", "300"))
+TTS_FIRST_SEGMENT_MIN_CHARS = int(os.getenv("TTS_FIRST_SEGMENT_MIN_CHARS", "40"))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("static", "tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+def clean_for_speech(text: str) -> str:
+    return re.sub(r"\s+", " ", text.replace("**", "").replace("#", "")).strip()
+
+
+def split_sentences(text: str, max_chars: int = TTS_SEGMENT_MAX_CHARS) -> list:
+    """
+    Découpe le texte en phrases ; une phrase plus longue que max_chars est
+    recoupée sur les virgules puis sur les espaces.
+    """
+    segments = []
+    for sentence in _SENTENCE_END.split(clean_for_speech(text)):
+        while len(sentence) > max_chars:
+            # Coupe après la virgule (ou sur l'espace) ; à défaut, coupe sèche à max_chars
+            cut = sentence.rfind(", ", 0, max_chars)
+            if cut <= 0:
+                cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut + 1 if cut > 0 else max_chars
+            segments.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            segments.append(sentence)
+    return segments
+
+
+async def sentences_from_tokens(tokens, max_chars: int = TTS_SEGMENT_MAX_CHARS,
+                                first_min_chars: int = TTS_FIRST_SEGMENT_MIN_CHARS):
+    """
+    Transforme un flux asynchrone de tokens en flux de phrases.
+    Une phrase est émise dès que sa ponctuation finale est suivie d'un espace ;
+    le premier segment peut être coupé plus tôt sur une virgule (au-delà de
+    first_min_chars) pour que la voix démarre au plus vite.
+    """
+    buffer = ""
+    first = True
+    async for token in tokens:
+        buffer += token
+        boundaries = [m.end() for m in _SENTENCE_END.finditer(buffer)]
+        if first and not boundaries:
+            boundaries = [m.end() for m in _CLAUSE_END.finditer(buffer) if m.start() >= first_min_chars][:1]
+        if boundaries:
+            ready, buffer = buffer[:boundaries[-1]], buffer[boundaries[-1]:]
+            for segment in split_sentences(ready, max_chars):
+                yield segment
+            first = False
+        elif len(buffer) > max_chars:
+            trailing_space = buffer[-1].isspace()
+            *ready, buffer = split_sentences(buffer, max_chars)
+            buffer += " " if trailing_space else ""
+            for segment in ready:
+                yield segment
+            first = False
+    for segment in split_sentences(buffer, max_chars):
+        yield segment
+
+
+class TTSCache:
+    """
+    Fichiers tts_<sha256>.mp3 ; la date de modification sert d'horodatage LRU.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, voice: str = TTS_VOICE) -> str:
+        normalized = unicodedata.normalize("NFC", clean_for_speech(text))
+        return hashlib.sha256(f"{voice}\n{normalized}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def filename(key: str) -> str:
+        return f"tts_{key}.mp3"
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def lookup(self, key: str):
+        """
+        Retourne le chemin du MP3 en cache (et le marque récemment utilisé), ou None.
+        Ne compte ni hit ni miss : c'est à l'appelant de le faire, à l'échelle de la phrase.
+        """
+        path = self.path(self.filename(key))
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get(self, key: str):
+        path = self.lookup(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with open(path, "rb") as f:
+            return f.read()
+
+    def put(self, key: str, data: bytes):
+        path = self.path(self.filename(key))
+        tmp_path = path + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _files(self) -> list:
+        files = []
+        for path in glob.glob(os.path.join(self.directory, "tts_*.mp3")):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        return files
+
+    def _evict(self):
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        while files and total > self.max_bytes:
+            _, size, path = files.pop(0)
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> dict:
+        files = self._files()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "files": len(files),
+            "bytes": sum(size for _, size, _ in files),
+            "max_bytes": self.max_bytes,
+        }
+
+
+async def _synthesize_chunks(text: str, voice: str):
+    communicate = edge_tts.Communicate(text, voice)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+
+
+async def _aiter(segments):
+    if hasattr(segments, "__aiter__"):
+        async for segment in segments:
+            yield segment
+    else:
+        for segment in segments:
+            yield segment
+
+
+async def stream_speech(segments, voice: str = TTS_VOICE, concurrency: int = TTS_CONCURRENCY, cache: TTSCache = None):
+    """
+    Synthétise les segments (liste ou itérable asynchrone) avec au plus `concurrency`
+    requêtes edge-tts simultanées, et produit les octets MP3 dans l'ordre des segments.
+    Le premier segment est transmis dès ses premiers octets reçus.
+    Avec un cache, les segments déjà connus sont relus sans appeler edge-tts.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    ordered = asyncio.Queue()
+    tasks = []
+
+    async def synthesize(text, out):
+        try:
+            key = cache.key(text, voice) if cache else None
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                await out.put(cached)
+                return
+            parts = []
+            async with semaphore:
+                async for data in _synthesize_chunks(text, voice):
+                    parts.append(data)
+                    await out.put(data)
+            if cache and parts:
+                cache.put(key, b"".join(parts))
+        except Exception as e:
+            print("⚠️ Erreur edge-tts sur un segment :", e)
+        finally:
+            await out.put(None)
+
+    async def produce():
+        try:
+            async for text in _aiter(segments):
+                out = asyncio.Queue()
+                tasks.append(asyncio.create_task(synthesize(text, out)))
+                await ordered.put(out)
+        finally:
+            await ordered.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (out := await ordered.get()) is not None:
+            while (data := await out.get()) is not None:
+                yield data
+        await producer
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+class SpeechJob:
+    """
+    Synthèse d'une réponse en tâche de fond, lisible en flux par plusieurs clients.
+    """
+
+    def __init__(self, save, segments, cache: TTSCache = None, on_done=None):
+        self.chunks = []
+        self.done = False
+        self._changed = asyncio.Event()
+        self._save = save
+        self._on_done = on_done
+        self._task = asyncio.create_task(self._run(segments, cache))
+
+    async def _run(self, segments, cache):
+        try:
+            async for data in stream_speech(segments, cache=cache):
+                self.chunks.append(data)
+                self._notify()
+            self._save(b"".join(self.chunks))
+        except Exception as e:
+            print("⚠️ Synthèse vocale interrompue :", e)
+        finally:
+            self.done = True
+            self._notify()
+            if self._on_done:
+                self._on_done(self)
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def iter_chunks(self):
+        i = 0
+        while True:
+            changed = self._changed
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done:
+                return
+            await changed.wait()
+
+
+def _write_file(path: str, data: bytes):
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class SpeechJobRegistry:
+    """
+    Synthèses en cours, indexées par nom de fichier MP3 (celui de l'audio_url).
+    Une synthèse terminée est retirée : son MP3 est alors servi depuis static/ ou le cache.
+    """
+
+    def __init__(self, directory: str = "static", cache: TTSCache = None):
+        self.directory = directory
+        self.cache = cache
+        self._jobs = {}
+
+    def _start(self, filename: str, segments, save) -> SpeechJob:
+        job = SpeechJob(save, segments, cache=self.cache,
+                        on_done=lambda _: self._jobs.pop(filename, None))
+        self._jobs[filename] = job
+        return job
+
+    def start(self, filename: str, segments) -> SpeechJob:
+        """
+        Synthèse d'un texte produit au fil de l'eau : MP3 écrit dans static/<filename>.
+        """
+        path = os.path.join(self.directory, filename)
+        return self._start(filename, segments, lambda data: _write_file(path, data))
+
+    def start_cached(self, text: str) -> str:
+        """
+        Synthèse d'une réponse connue : le MP3 est adressé par son contenu.
+        Retourne le nom du fichier ; en cas de hit, aucune synthèse n'est lancée.
+        """
+        key = self.cache.key(text)
+        filename = self.cache.filename(key)
+        if filename in self._jobs:
+            return filename
+        segments = split_sentences(text)
+        if self.cache.lookup(key) is not None:
+            # Mêmes unités que stream_speech : chaque phrase évitée compte un hit
+            self.cache.hits += len(segments)
+        else:
+            # Les hits / misses par phrase sont comptés par stream_speech
+            self._start(filename, segments, lambda data: self.cache.put(key, data))
+        return filename
+
+    def get(self, filename: str):
+        return self._jobs.get(filename)
@@ -0,0 +1,281 @@
+# batch_scoring.py
+
+# """
+# batch_scoring.py – Score de compatibilité en lot (plusieurs CV × plusieurs offres).
+# - Chaque paire (CV, offre) est scorée par groq_analyzer.score_cv_async.
+# - Les requêtes sont lancées en parallèle (BATCH_CONCURRENCY) sous un budget
+#   de requêtes et de tokens par minute (BATCH_REQUESTS_PER_MINUTE, BATCH_TOKENS_PER_MINUTE).
+# - Chaque résultat est écrit dès qu’il arrive (JSONL ou CSV) ; relancer la même
+#   commande reprend là où elle s’était arrêtée, sans rescorer les paires déjà faites.
+# - Un score local TF-IDF (local_scorer) est calculé pour tout le lot avant les appels :
+#     • --min-local N écarte sans appel Groq les paires dont le score local est < N,
+#     • --mode local n’appelle jamais Groq, --mode hybrid mélange score local et score LLM.
+#
+# Usage :
+#     python batch_scoring.py --cv mon_cv.pdf --offers offres.jsonl --out scores.jsonl
+#     python batch_scoring.py --cv cvs/*.pdf --offers offre.txt --out scores.csv
+#     python batch_scoring.py --cv mon_cv.pdf --offers offres.jsonl --out scores.jsonl --min-local 20 --mode hybrid
+#
+# Les offres sont des fichiers .txt (une offre par fichier) ou .jsonl, une offre par
+# ligne au format de /extract_job : {"title", "company", "location", "description"}
+# (+ "url" ou "id" facultatifs pour identifier l’offre).
+# """
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+
+from groq_analyzer import score_cv_async
+from local_scorer import blend_scores, local_scores
+from parser import extract_text
+from prompt_builder import PROMPT_TOKEN_BUDGET, count_tokens
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_REQUESTS_PER_MINUTE = float(os.getenv("BATCH_REQUESTS_PER_MINUTE", "30"))
+BATCH_TOKENS_PER_MINUTE = float(os.getenv("BATCH_TOKENS_PER_MINUTE", "30000"))
+
+# Prompt système + consignes de score_cv, et la réponse (un entier)
+_PROMPT_OVERHEAD_TOKENS = 150
+_RESULT_FIELDS = ["cv", "offer", "title", "local_score", "llm_score", "score", "filtered", "error", "seconds"]
+SCORING_MODES = ("llm", "local", "hybrid")
+
+
+def estimate_tokens(cv_text: str, offer_text: str) -> int:
+    # Le prompt de score_cv est compacté sous PROMPT_TOKEN_BUDGET par prompt_builder
+    return min(count_tokens(cv_text) + count_tokens(offer_text), PROMPT_TOKEN_BUDGET) + _PROMPT_OVERHEAD_TOKENS
+
+
+class MinuteBudget:
+    """
+    Fenêtre glissante d’une minute sur le nombre de requêtes et de tokens consommés.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._events = deque()
+        self._tokens = 0
+        self._lock = asyncio.Lock()
+
+    def _expire(self, now: float):
+        while self._events and now - self._events[0][0] >= 60:
+            _, tokens = self._events.popleft()
+            self._tokens -= tokens
+
+    async def acquire(self, tokens: int):
+        # Une requête plus grosse que le budget entier passe seule, fenêtre vide
+        tokens = min(tokens, int(self.tokens_per_minute))
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                if (len(self._events) < self.requests_per_minute
+                        and self._tokens + tokens <= self.tokens_per_minute):
+                    self._events.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                await asyncio.sleep(60 - (now - self._events[0][0]))
+
+
+def _offer_text(offer: dict) -> str:
+    return "\n".join(offer.get(k, "") for k in ("title", "company", "location", "description") if offer.get(k))
+
+
+def load_offers(paths: list) -> dict:
+    """
+    Retourne {identifiant: offre} ; l’identifiant est "id", sinon "url", sinon un hash du texte.
+    """
+    offers = {}
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    offer = json.loads(line)
+                    if offer.get("error"):
+                        continue
+                    offer_id = offer.get("id") or offer.get("url") or hashlib.sha1(_offer_text(offer).encode("utf-8")).hexdigest()[:12]
+                    offers[offer_id] = offer
+        else:
+            offers[os.path.basename(path)] = {"description": extract_text(path)}
+    return offers
+
+
+def load_cvs(paths: list) -> dict:
+    return {os.path.basename(path): extract_text(path) for path in paths}
+
+
+def load_done_pairs(out_path: str) -> set:
+    """
+    Paires déjà scorées avec succès dans un fichier de résultats existant (reprise).
+    Une ligne illisible (dernière ligne tronquée par un arrêt brutal) est ignorée :
+    la paire correspondante sera simplement scorée à nouveau.
+    """
+    if not out_path or not os.path.exists(out_path):
+        return set()
+    rows = []
+    with open(out_path, encoding="utf-8", newline="") as f:
+        if out_path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print("⚠️ Ligne de résultat illisible ignorée :", line.strip()[:80])
+    return {
+        (row["cv"], row["offer"]) for row in rows
+        if isinstance(row, dict) and row.get("cv") and row.get("offer") and not row.get("error")
+    }
+
+
+class ResultWriter:
+    """
+    Ajoute chaque résultat au fichier dès sa réception (JSONL ou CSV selon l’extension).
+    """
+
+    def __init__(self, out_path: str):
+        self.is_csv = out_path.endswith(".csv")
+        new_file = not os.path.exists(out_path) or os.path.getsize(out_path) == 0
+        # Une ligne tronquée par un arrêt brutal ne doit pas se coller au premier nouveau résultat
+        truncated = False
+        if not new_file:
+            with open(out_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                truncated = f.read(1) != b"\n"
+        self._file = open(out_path, "a", encoding="utf-8", newline="")
+        if truncated:
+            self._file.write("\n")
+        if self.is_csv:
+            self._csv = csv.DictWriter(self._file, fieldnames=_RESULT_FIELDS)
+            if new_file:
+                self._csv.writeheader()
+
+    def write(self, result: dict):
+        if self.is_csv:
+            self._csv.writerow({k: result.get(k) for k in _RESULT_FIELDS})
+        else:
+            self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+async def score_batch_async(cvs: dict, offers: dict, out_path: str = None,
+                            concurrency: int = BATCH_CONCURRENCY,
+                            requests_per_minute: float = BATCH_REQUESTS_PER_MINUTE,
+                            tokens_per_minute: float = BATCH_TOKENS_PER_MINUTE,
+                            mode: str = "llm", min_local_score: float = 0,
+                            on_result=None) -> list:
+    """
+    Score toutes les paires CV × offre ({id: texte} et {id: offre}) et retourne la liste
+    des résultats {"cv", "offer", "title", "local_score", "llm_score", "score", "filtered", "error", "seconds"}.
+    mode : "llm" (score Groq), "local" (TF-IDF seul, sans réseau) ou "hybrid" (mélange des deux).
+    Les paires dont le score local est < min_local_score ne sont pas envoyées à Groq
+    (filtered=True, score = score local).
+    Avec out_path, les paires déjà présentes dans le fichier sont ignorées et les
+    nouvelles y sont ajoutées au fil de l’eau.
+    """
+    if mode not in SCORING_MODES:
+        raise ValueError(f"Mode de score inconnu : {mode} (attendu : {', '.join(SCORING_MODES)})")
+
+    done = load_done_pairs(out_path)
+    cv_ids, offer_ids = list(cvs), list(offers)
+    # Un seul produit matriciel creux pour tout le lot
+    local = local_scores([cvs[c] for c in cv_ids], [_offer_text(offers[o]) for o in offer_ids])
+    local_by_pair = {(c, o): int(local[i, j]) for i, c in enumerate(cv_ids) for j, o in enumerate(offer_ids)}
+    pairs = [pair for pair in local_by_pair if pair not in done]
+
+    budget = MinuteBudget(requests_per_minute, tokens_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    writer = ResultWriter(out_path) if out_path else None
+    results = []
+
+    async def score_pair(cv_id, offer_id):
+        cv_text = cvs[cv_id]
+        offer_text = _offer_text(offers[offer_id])
+        local_score = local_by_pair[(cv_id, offer_id)]
+        result = {"cv": cv_id, "offer": offer_id, "title": offers[offer_id].get("title", ""),
+                  "local_score": local_score, "llm_score": None, "score": local_score,
+                  "filtered": False, "error": None, "seconds": 0.0}
+        if mode == "local" or local_score < min_local_score:
+            result["filtered"] = mode != "local"
+        else:
+            async with semaphore:
+                await budget.acquire(estimate_tokens(cv_text, offer_text))
+                start = time.perf_counter()
+                try:
+                    result["llm_score"] = await score_cv_async(cv_text, offer_text)
+                    result["score"] = (blend_scores(local_score, result["llm_score"]) if mode == "hybrid"
+                                       else result["llm_score"])
+                except Exception as e:
+                    result["score"] = None
+                    result["error"] = str(e)
+                result["seconds"] = round(time.perf_counter() - start, 3)
+        results.append(result)
+        if writer:
+            writer.write(result)
+        if on_result:
+            on_result(result)
+
+    try:
+        await asyncio.gather(*(score_pair(cv_id, offer_id) for cv_id, offer_id in pairs))
+    finally:
+        if writer:
+            writer.close()
+    return results
+
+
+def score_batch(cvs: dict, offers: dict, out_path: str = None, **kwargs) -> list:
+    return asyncio.run(score_batch_async(cvs, offers, out_path, **kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score de compatibilité CV × offres en lot (Groq).")
+    parser.add_argument("--cv", nargs="+", required=True, help="CV (.pdf ou .txt)")
+    parser.add_argument("--offers", nargs="+", required=True, help="Offres (.jsonl ou .txt)")
+    parser.add_argument("--out", required=True, help="Fichier de résultats (.jsonl ou .csv), repris s'il existe")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=BATCH_REQUESTS_PER_MINUTE, help="Requêtes par minute")
+    parser.add_argument("--tpm", type=float, default=BATCH_TOKENS_PER_MINUTE, help="Tokens par minute")
+    parser.add_argument("--mode", choices=SCORING_MODES, default="llm",
+                        help="llm : score Groq ; local : TF-IDF sans réseau ; hybrid : mélange des deux")
+    parser.add_argument("--min-local", type=float, default=0,
+                        help="Score local minimal (0–100) pour envoyer une paire à Groq")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    cvs = load_cvs(args.cv)
+    offers = load_offers(args.offers)
+    already = len(load_done_pairs(args.out))
+    print(f"📄 {len(cvs)} CV × {len(offers)} offres ({already} paires déjà scorées)", file=sys.stderr)
+
+    def progress(result):
+        status = f"{result['score']}/100" if result["error"] is None else f"❌ {result['error']}"
+        if result["filtered"]:
+            status += " (score local, écartée)"
+        print(f"  {result['cv']} × {result['offer']} : {status}", file=sys.stderr)
+
+    results = score_batch(cvs, offers, args.out, concurrency=args.concurrency,
+                          requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                          mode=args.mode, min_local_score=args.min_local, on_result=progress)
+    errors = sum(1 for r in results if r["error"])
+    filtered = sum(1 for r in results if r["filtered"])
+    print(f"✅ {len(results) - errors} paires scorées dont {filtered} écartées par le score local, "
+          f"{errors} en erreur (relancer pour les reprendre)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# cv_sections.py
+
+# """
+# cv_sections.py – Découpage d’un CV en sections et ciblage des suggestions.
+# - split_sections() : repère les titres de section (Expérience, Formation, Compétences…,
+#   ou lignes courtes en MAJUSCULES) et découpe le texte brut ; le bloc avant le premier
+#   titre est l’en-tête (nom, coordonnées, accroche).
+# - assign_suggestions() : rattache chaque ligne de suggestion à la section qu’elle vise
+#   (thème du titre + mots communs) ; les lignes sans cible claire sont ignorées.
+# - join_sections() : réassemble le CV ; sans réécriture, le texte d’origine est restitué tel quel.
+# Utilisé par groq_analyzer.generate_updated_cv_by_sections_*() pour ne réécrire que les
+# sections concernées, en parallèle.
+# """
+
+import re
+from dataclasses import dataclass
+
+from local_scorer import _strip_accents, tokenize
+
+# Thèmes de section : mots-clés reconnus dans les titres du CV et dans les suggestions
+SECTION_THEMES = {
+    "profil": ["profil", "resume", "a propos", "objectif", "summary", "about", "accroche"],
+    "experience": ["experience", "parcours professionnel", "emploi", "stage", "alternance",
+                   "mission", "work history", "employment"],
+    "formation": ["formation", "education", "diplome", "etudes", "cursus", "scolarite"],
+    "competences": ["competence", "skills", "savoir-faire", "outils", "technologies",
+                    "stack", "informatique", "logiciel"],
+    "projets": ["projet", "projects", "realisation", "portfolio"],
+    "certifications": ["certification", "certificat", "mooc", "licence"],
+    "langues": ["langue", "languages", "anglais", "english"],
+    "interets": ["centres d'interet", "interets", "loisirs", "hobbies", "activites", "benevolat"],
+}
+# Débuts de titres de section (les thèmes ci-dessus contiennent aussi des mots de contenu,
+# comme "anglais" ou "stage", qui ne font pas un titre)
+HEADING_KEYWORDS = (
+    "profil", "resume", "a propos", "objectif", "summary", "about", "experience", "parcours",
+    "emploi", "formation", "education", "diplome", "etudes", "cursus", "competence", "skills",
+    "savoir", "projet", "projects", "realisation", "certification", "langue", "languages",
+    "centres d'interet", "interets", "loisirs", "hobbies", "activites", "benevolat",
+    "informations", "contact", "references",
+)
+HEADING_MAX_CHARS = 40
+# Section où ajouter une suggestion dont le thème n'a pas de section dans le CV
+THEME_FALLBACKS = {"certifications": "formation", "projets": "experience"}
+
+_BULLET = re.compile(r"^\s*(?:[-*•▪►]|\d+[.)])\s*")
+
+
+@dataclass
+class Section:
+    heading: str  # ligne de titre telle qu'écrite dans le CV ("" pour l'en-tête)
+    body: str  # None quand le titre est la dernière ligne du CV
+    theme: str = None
+
+    @property
+    def text(self) -> str:
+        if not self.heading:
+            return self.body
+        return self.heading if self.body is None else f"{self.heading}\n{self.body}"
+
+
+def _normalize(line: str) -> str:
+    return _strip_accents(line.lower()).strip(" \t:-–—•*#")
+
+
+def _theme(text: str) -> str:
+    # Le premier thème nommé dans le texte l'emporte ("ajouter en compétences l'expérience…")
+    normalized = _normalize(text)
+    found = [(normalized.find(keyword), theme)
+             for theme, keywords in SECTION_THEMES.items() for keyword in keywords if keyword in normalized]
+    return min(found)[1] if found else None
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip().strip(":#").strip()
+    if not stripped or len(stripped) > HEADING_MAX_CHARS or _BULLET.match(line):
+        return False
+    normalized = _normalize(stripped)
+    if any(normalized.startswith(keyword) for keyword in HEADING_KEYWORDS):
+        return True
+    letters = [c for c in stripped if c.isalpha()]
+    return len(letters) >= 4 and stripped.isupper() and len(stripped.split()) <= 5
+
+
+def split_sections(cv_text: str) -> list:
+    """
+    Découpe le CV en sections ; join_sections(split_sections(t)) == t.
+    """
+    sections = []
+    heading, theme, body = "", "profil", []
+    for i, line in enumerate(cv_text.split("\n")):
+        if _is_heading(line):
+            # Pas d'en-tête quand le CV commence directement par un titre
+            if i > 0:
+                sections.append(Section(heading, "\n".join(body) if body or not heading else None, theme))
+            heading, theme, body = line, _theme(line), []
+        else:
+            body.append(line)
+    sections.append(Section(heading, "\n".join(body) if body or not heading else None, theme))
+    return sections
+
+
+def join_sections(sections: list) -> str:
+    return "\n".join(section.text for section in sections)
+
+
+def assign_suggestions(sections: list, suggestions: str) -> dict:
+    """
+    Retourne {indice de section: [lignes de suggestion]} pour les sections visées.
+    Une ligne va à la section de même thème si elle en nomme un, sinon à celle
+    (hors en-tête) avec laquelle elle partage le plus de mots.
+    """
+    vocabularies = [set(tokenize(section.text)) for section in sections]
+    by_theme = {}
+    # Une vraie section "Profil" passe avant l'en-tête
+    for i, section in sorted(enumerate(sections), key=lambda item: not item[1].heading):
+        by_theme.setdefault(section.theme, i)
+
+    targeted = {}
+    for line in suggestions.splitlines():
+        line = _BULLET.sub("", line).strip()
+        # Titres Markdown et lignes trop courtes : pas une suggestion en soi
+        if len(line) < 15 or line.startswith("#"):
+            continue
+        theme = _theme(line)
+        if theme not in by_theme:
+            theme = THEME_FALLBACKS.get(theme)
+        if theme in by_theme:
+            target = by_theme[theme]
+        else:
+            words = set(tokenize(line))
+            overlaps = [len(words & vocabulary) if section.heading else 0
+                        for section, vocabulary in zip(sections, vocabularies)]
+            best = max(overlaps, default=0)
+            if best < 2:
+                continue
+            target = overlaps.index(best)
+        targeted.setdefault(target, []).append(line)
+    return targeted
@@ -4,34 +4,59 @@
 # groq_analyzer.py – Module d’interaction avec l’API Groq (LLaMA 3) pour :
 # - Analyser l’écart entre le CV et la fiche de poste.
 # - Générer un CV réécrit à partir des suggestions.
+# - generate_updated_cv_by_sections_async() : ne réécrit que les sections visées par les
+#   suggestions (cv_sections), en requêtes parallèles ; les autres restent mot pour mot.
+#   generate_updated_cv_by_sections_stream() produit le CV à chaque section terminée.
 # - Obtenir un score de compatibilité (0–100).
+# - analyze_cv_structured() : un seul appel en mode JSON qui renvoie écarts, suggestions,
+#   questions d’entretien, roadmap et score, validé contre ANALYSIS_SCHEMA (rejoué si invalide).
+# - Variantes en streaming (*_stream) de l’analyse et de la réécriture, qui produisent
+#   le texte au fil des tokens (ou des sections) pour un affichage progressif.
+# - Variantes asynchrones (*_async), pour paralléliser des requêtes Groq indépendantes
+#   (batch_scoring), et analyze_and_score(), qui lance en même temps l’analyse structurée
+#   (analyse + score en un appel), le score local et le découpage du CV en sections.
 # """
 
-# GROQ_API_URL doit être mis à jour si vous avez une URL différente.
-# API_KEY lu depuis .env, on lève ValueError si absent.
+# Les appels HTTP passent par groq_client (session keep-alive partagée, timeouts,
+# rejeu des 429/5xx avec backoff, limiteur de débit) ; GROQ_API_KEY manquante → ValueError.
 # Chaque fonction construit un “system_prompt” (mission) et “user_prompt” (le contexte).
-# On utilise requests.post() et resp.raise_for_status() pour gérer les erreurs HTTP.
-# Dans score_cv(), on nettoie la réponse brute pour extraire uniquement l’entier.
+# Dans score_cv(), on extrait le premier entier de la réponse brute (borné à 0–100).
+# Les réponses sont mises en cache (llm_cache) avec une durée propre à chaque fonction ;
+# use_cache=False force un nouvel appel (ex. pour obtenir une autre formulation).
+# Les prompts utilisateur passent par prompt_builder : l'offre scrapée est nettoyée, et
+# CV, offre et suggestions ne sont compactés qu'au-delà de PROMPT_TOKEN_BUDGET
+# (voir prompt_builder.stats()).
 
 
+import asyncio
+import json
 import os
-import requests
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def analyze_cv_and_offer(cv_text: str, offer_text: str) -> str:
-    """
-    Envoie au modèle LLaMA 3 le CV et la fiche de poste,
-    et retourne un texte structuré : écarts, suggestions, questions, roadmap.
-    """
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("La clé GROQ_API_KEY est manquante dans l'environnement.")
+from cv_sections import assign_suggestions, join_sections, split_sections
+from groq_client import InvalidCompletion, chat_completion, stream_chat_completion
+from local_scorer import local_score
+from prompt_builder import PROMPT_TOKEN_BUDGET, build_messages
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+# Durées de vie du cache par fonction (secondes) ; 0 désactive le cache pour la fonction
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(24 * 3600)))
+UPDATED_CV_CACHE_TTL = float(os.getenv("UPDATED_CV_CACHE_TTL", str(24 * 3600)))
+SCORE_CACHE_TTL = float(os.getenv("SCORE_CACHE_TTL", str(7 * 24 * 3600)))
+# La réécriture renvoie un CV complet : on laisse plus de place à la réponse
+REWRITE_TOKEN_BUDGET = int(os.getenv("REWRITE_TOKEN_BUDGET", str(PROMPT_TOKEN_BUDGET * 3 // 4)))
+STRUCTURED_MAX_ATTEMPTS = int(os.getenv("STRUCTURED_MAX_ATTEMPTS", "3"))
+
+# Schéma de la réponse de analyze_cv_structured() : champ → type attendu
+ANALYSIS_SCHEMA = {
+    "gaps": list,
+    "suggestions": list,
+    "interview_questions": list,
+    "roadmap": list,
+    "score": int,
+}
 
+def _analysis_messages(cv_text: str, offer_text: str) -> list:
     system_prompt = (
         "Tu es un expert en recrutement et en ressources humaines. "
         "On va te fournir deux blocs de texte :\n"
@@ -45,42 +70,33 @@ def analyze_cv_and_offer(cv_text: str, offer_text: str) -> str:
         "- En fin de réponse, rends **uniquement** le texte des suggestions structurées (ne répète pas le CV ni la fiche de poste).\n"
     )
 
-    user_prompt = (
-        f"=== CV ORIGINAL ===\n{cv_text}\n\n"
-        f"=== FICHE DE POSTE ===\n{offer_text}\n\n"
-        "=== RÉALISE TON ANALYSE CI-DESSOUS : ==="
+    messages, _ = build_messages(
+        system_prompt,
+        [("CV ORIGINAL", cv_text, 1), ("FICHE DE POSTE", offer_text, 1, True)],
+        "=== RÉALISE TON ANALYSE CI-DESSOUS : ===",
+        name="analysis",
     )
+    return messages
 
-    data = {
-        "model": "llama3-8b-8192",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": user_prompt}
-        ],
-        "temperature": 0.7
-    }
 
-    response = requests.post(url, headers=headers, json=data)
-    response.raise_for_status()
-    result = response.json()
-    return result["choices"][0]["message"]["content"]
+def analyze_cv_and_offer(cv_text: str, offer_text: str, use_cache: bool = True) -> str:
+    """
+    Envoie au modèle LLaMA 3 le CV et la fiche de poste,
+    et retourne un texte structuré : écarts, suggestions, questions, roadmap.
+    """
+    return chat_completion(_analysis_messages(cv_text, offer_text), temperature=0.7,
+                           cache_ttl=ANALYSIS_CACHE_TTL if use_cache else None, operation="analysis")
 
 
-def generate_updated_cv(cv_text: str, suggestions: str) -> str:
+def analyze_cv_and_offer_stream(cv_text: str, offer_text: str, use_cache: bool = True):
     """
-    Réécrit le CV en insérant directement les suggestions (réalisé par LLaMA 3).
-    Retourne le texte complet du CV mis à jour.
+    Comme analyze_cv_and_offer, mais produit le texte au fil des tokens (st.write_stream).
     """
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("La clé GROQ_API_KEY est manquante dans l'environnement.")
+    return stream_chat_completion(_analysis_messages(cv_text, offer_text), temperature=0.7,
+                                  cache_ttl=ANALYSIS_CACHE_TTL if use_cache else None, operation="analysis")
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
 
+def _updated_cv_messages(cv_text: str, suggestions: str) -> list:
     system_prompt = (
     "Tu es un expert en recrutement RH. On va te fournir :\n"
     "  1. Un CV complet (texte brut).\n"
@@ -93,46 +109,148 @@ def generate_updated_cv(cv_text: str, suggestions: str) -> str:
     "    • plus dynamique et synthétique pour des start-ups.\n"
     "- Respecter la structure du CV d’origine : titres, listes, puces, majuscules, etc.\n"
     "- Améliorer la lisibilité, la formulation, et éviter les redondances ou listes trop longues.\n"
+    "- Écrire uniquement en français, sans aucune partie en anglais.\n"
     "- À la fin, retourne uniquement le texte final du CV, prêt à être converti en PDF."
     )   
 
 
-    user_prompt = (
-        f"=== CV ORIGINAL ===\n{cv_text}\n\n"
-        f"=== SUGGESTIONS IA ===\n{suggestions}\n\n"
-        "=== RÉÉCRIS LE CV MIS À JOUR ICI : ==="
+    # Le CV est le texte à réécrire : il garde la plus grosse part du budget
+    messages, _ = build_messages(
+        system_prompt,
+        [("CV ORIGINAL", cv_text, 2), ("SUGGESTIONS IA", suggestions, 1)],
+        "=== RÉÉCRIS LE CV MIS À JOUR ICI : ===",
+        budget=REWRITE_TOKEN_BUDGET,
+        name="updated_cv",
+    )
+    return messages
+
+
+def generate_updated_cv(cv_text: str, suggestions: str, use_cache: bool = True) -> str:
+    """
+    Réécrit le CV en insérant directement les suggestions (réalisé par LLaMA 3).
+    Retourne le texte complet du CV mis à jour.
+    """
+    return chat_completion(_updated_cv_messages(cv_text, suggestions), temperature=0.7,
+                           cache_ttl=UPDATED_CV_CACHE_TTL if use_cache else None, operation="updated_cv")
+
+
+def generate_updated_cv_stream(cv_text: str, suggestions: str, use_cache: bool = True):
+    """
+    Comme generate_updated_cv, mais produit le CV réécrit au fil des tokens.
+    """
+    return stream_chat_completion(_updated_cv_messages(cv_text, suggestions), temperature=0.7,
+                                  cache_ttl=UPDATED_CV_CACHE_TTL if use_cache else None, operation="updated_cv")
+
+
+def _section_messages(section, suggestions: list, cv_text: str) -> list:
+    system_prompt = (
+        "Tu es un expert en recrutement RH. On va te fournir une section d'un CV, "
+        "les suggestions qui la concernent, et le reste du CV pour contexte.\n\n"
+        "Ta mission :\n"
+        "- Réécrire **uniquement cette section** en intégrant les suggestions, sans inventer d'expérience (pas de mensonge).\n"
+        "- Ne pas répéter ce qui figure déjà dans d'autres sections du CV.\n"
+        "- Respecter la mise en forme d'origine : listes, puces, dates, majuscules.\n"
+        "- Écrire uniquement en français.\n"
+        "- Retourne uniquement le contenu de la section, sans son titre ni commentaire."
     )
 
-    data = {
-        "model": "llama3-8b-8192",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": user_prompt}
+    messages, _ = build_messages(
+        system_prompt,
+        [
+            (f"SECTION À RÉÉCRIRE : {section.heading.strip() or 'EN-TÊTE'}", section.body, 2),
+            ("SUGGESTIONS POUR CETTE SECTION", "\n".join(f"- {s}" for s in suggestions), 1),
+            ("RESTE DU CV (CONTEXTE, NE PAS RÉÉCRIRE)", cv_text, 1),
         ],
-        "temperature": 0.7
-    }
+        "=== RÉÉCRIS LA SECTION ICI : ===",
+        budget=REWRITE_TOKEN_BUDGET,
+        name="cv_section",
+    )
+    return messages
 
-    response = requests.post(url, headers=headers, json=data)
-    response.raise_for_status()
-    result = response.json()
-    return result["choices"][0]["message"]["content"]
 
+def _rewrite_section(section, suggestions: list, cv_text: str, use_cache: bool = True) -> str:
+    reply = chat_completion(_section_messages(section, suggestions, cv_text), temperature=0.7,
+                            cache_ttl=UPDATED_CV_CACHE_TTL if use_cache else None,
+                            operation="cv_section").strip("\n")
+    # Le modèle répète parfois le titre malgré la consigne
+    lines = reply.split("\n")
+    if section.heading and lines and lines[0].strip().lower() == section.heading.strip().lower():
+        reply = "\n".join(lines[1:]).strip("\n")
+    return reply
 
-def score_cv(cv_text: str, offer_text: str) -> int:
+
+def _targeted_sections(cv_text: str, suggestions: str):
     """
-    Demande au modèle LLaMA 3 de donner un score (entier de 0 à 100) 
-    indiquant le degré de correspondance du CV à la fiche de poste.
+    (sections, {indice: suggestions}) ; (None, None) si le CV n'a pas de section reconnue
+    ou si aucune suggestion ne vise une section : il faut alors réécrire le CV complet.
     """
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("La clé GROQ_API_KEY est manquante dans l'environnement.")
+    sections = split_sections(cv_text)
+    targeted = assign_suggestions(sections, suggestions)
+    if len(sections) < 2 or not targeted:
+        return None, None
+    return sections, targeted
+
+
+def _apply_rewrite(section, rewrite):
+    if isinstance(rewrite, Exception):
+        print(f"⚠️ Réécriture de la section « {section.heading.strip() or 'en-tête'} » impossible :", rewrite)
+    elif rewrite.strip():
+        # On garde les sauts de ligne qui séparaient la section de la suivante
+        body = section.body or ""
+        section.body = rewrite + body[len(body.rstrip("\n")):]
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
 
+async def generate_updated_cv_by_sections_async(cv_text: str, suggestions: str, use_cache: bool = True) -> str:
+    """
+    Réécrit en parallèle les seules sections visées par les suggestions et réassemble le CV.
+    Sans section reconnue (CV non structuré), retombe sur la réécriture complète.
+    Une section dont la réécriture échoue est conservée telle quelle.
+    """
+    sections, targeted = _targeted_sections(cv_text, suggestions)
+    if sections is None:
+        return await generate_updated_cv_async(cv_text, suggestions, use_cache)
+
+    indices = sorted(targeted)
+    rewrites = await asyncio.gather(
+        *(asyncio.to_thread(_rewrite_section, sections[i], targeted[i], cv_text, use_cache) for i in indices),
+        return_exceptions=True,
+    )
+    for i, rewrite in zip(indices, rewrites):
+        _apply_rewrite(sections[i], rewrite)
+    return join_sections(sections)
+
+
+def generate_updated_cv_by_sections_stream(cv_text: str, suggestions: str, use_cache: bool = True):
+    """
+    Variante progressive (pages Streamlit) de generate_updated_cv_by_sections_async :
+    produit le CV complet à chaque section réécrite, dans l'ordre où les réécritures se
+    terminent. Sans section reconnue, produit le CV réécrit au fil des tokens.
+    La dernière valeur produite est le CV final.
+    """
+    sections, targeted = _targeted_sections(cv_text, suggestions)
+    if sections is None:
+        text = ""
+        for part in generate_updated_cv_stream(cv_text, suggestions, use_cache):
+            text += part
+            yield text
+        return
+
+    with ThreadPoolExecutor(max_workers=len(targeted)) as executor:
+        futures = {
+            executor.submit(_rewrite_section, sections[i], targeted[i], cv_text, use_cache): i
+            for i in sorted(targeted)
+        }
+        for future in as_completed(futures):
+            error = future.exception()
+            _apply_rewrite(sections[futures[future]], error if error is not None else future.result())
+            yield join_sections(sections)
+
+
+def score_cv(cv_text: str, offer_text: str, use_cache: bool = True) -> int:
+    """
+    Demande au modèle LLaMA 3 de donner un score (entier de 0 à 100) 
+    indiquant le degré de correspondance du CV à la fiche de poste.
+    """
     system_prompt = (
         "Tu es un ancien recruteur, maintenant expert IA. "
         "Tu vas évaluer à quel point un CV correspond à une fiche de poste.\n"
@@ -140,29 +258,173 @@ def score_cv(cv_text: str, offer_text: str) -> int:
         "- Ne fais pas de commentaire, ne renvoie pas de texte explicatif.\n"
     )
 
-    user_prompt = (
-        f"=== CV ORIGINAL ===\n{cv_text}\n\n"
-        f"=== FICHE DE POSTE ===\n{offer_text}\n\n"
-        "=== DONNE LE SCORE (0 à 100) : ==="
+    messages, _ = build_messages(
+        system_prompt,
+        [("CV ORIGINAL", cv_text, 1), ("FICHE DE POSTE", offer_text, 1, True)],
+        "=== DONNE LE SCORE (0 à 100) : ===",
+        name="score",
     )
+    # Température 0 : réponse déterministe, entièrement cacheable
+    reply = chat_completion(messages, temperature=0.0,
+                            cache_ttl=SCORE_CACHE_TTL if use_cache else None, operation="score").strip()
 
-    data = {
-        "model": "llama3-8b-8192",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": user_prompt}
-        ],
-        "temperature": 0.0
-    }
+    return _parse_score(reply)
+
+
+def _parse_score(reply: str) -> int:
+    # Premier entier de la réponse ("Score : 85/100" → 85), borné à 0–100 ; 0 si aucun
+    match = re.search(r"\d+", reply)
+    return min(100, int(match.group())) if match else 0
 
-    response = requests.post(url, headers=headers, json=data)
-    response.raise_for_status()
-    result = response.json()
-    reply = result["choices"][0]["message"]["content"].strip()
 
-    # On tente de récupérer un entier dans la réponse
+def _structured_messages(cv_text: str, offer_text: str) -> list:
+    system_prompt = (
+        "Tu es un expert en recrutement et en ressources humaines. "
+        "On va te fournir le contenu d'un CV et celui d'une fiche de poste (texte brut).\n\n"
+        "Ta mission :\n"
+        "- Analyser les écarts entre le CV et la fiche de poste.\n"
+        "- Pour chaque écart, proposer des suggestions très concrètes : compétences à ajouter, expériences à mentionner, etc.\n"
+        "- Proposer des questions d'entretien probables en lien avec la fiche de poste.\n"
+        "- Donner une roadmap détaillée pour acquérir les compétences manquantes.\n"
+        "- Donner un score de correspondance du CV à la fiche de poste (0 = aucune correspondance, 100 = match parfait).\n\n"
+        "Réponds **uniquement** avec un objet JSON, en français, de la forme :\n"
+        '{"gaps": ["..."], "suggestions": ["..."], "interview_questions": ["..."], '
+        '"roadmap": ["..."], "score": 0}\n'
+        "Chaque liste contient des chaînes de caractères ; score est un entier de 0 à 100."
+    )
+
+    messages, _ = build_messages(
+        system_prompt,
+        [("CV ORIGINAL", cv_text, 1), ("FICHE DE POSTE", offer_text, 1, True)],
+        "=== RÉPONDS EN JSON : ===",
+        name="structured_analysis",
+    )
+    return messages
+
+
+def parse_structured_analysis(content: str) -> dict:
+    """
+    Parse et valide la réponse JSON contre ANALYSIS_SCHEMA.
+    Lève ValueError en précisant le premier champ invalide.
+    """
     try:
-        score = int("".join(ch for ch in reply if ch.isdigit()))
-    except:
-        score = 0
-    return score
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON invalide : {e}")
+    if not isinstance(data, dict):
+        raise ValueError("La réponse doit être un objet JSON.")
+
+    for field, expected in ANALYSIS_SCHEMA.items():
+        value = data.get(field)
+        if expected is int:
+            # Certains modèles renvoient "85" ou 85.0 : on accepte tant que c'est un entier
+            if isinstance(value, str) and value.strip().isdigit():
+                value = int(value)
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 100:
+                raise ValueError(f"Le champ '{field}' doit être un entier de 0 à 100.")
+        elif not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"Le champ '{field}' doit être une liste de chaînes.")
+        data[field] = value
+    return {field: data[field] for field in ANALYSIS_SCHEMA}
+
+
+def analyze_cv_structured(cv_text: str, offer_text: str, use_cache: bool = True) -> dict:
+    """
+    Analyse complète et score en un seul appel (mode JSON de Groq).
+    Retourne {"gaps", "suggestions", "interview_questions", "roadmap", "score"}.
+    Une réponse qui ne respecte pas le schéma est rejouée (jusqu’à STRUCTURED_MAX_ATTEMPTS
+    appels) en renvoyant au modèle l’erreur de validation ; ValueError si tous échouent.
+    """
+    messages = _structured_messages(cv_text, offer_text)
+    error = None
+    for attempt in range(STRUCTURED_MAX_ATTEMPTS):
+        content = None
+        try:
+            # Température basse : le score doit rester stable d'un appel à l'autre
+            content = chat_completion(
+                messages, temperature=0.3,
+                cache_ttl=ANALYSIS_CACHE_TTL if use_cache and attempt == 0 else None,
+                response_format={"type": "json_object"},
+                validate=parse_structured_analysis,
+                operation="structured_analysis",
+            )
+            return parse_structured_analysis(content)
+        except InvalidCompletion as e:
+            error, content = e, e.content
+        except Exception as e:
+            # Groq rejette lui-même (HTTP 400) un JSON mal formé en mode json_object
+            if getattr(getattr(e, "response", None), "status_code", None) != 400:
+                raise
+            error = e
+        if content is not None:
+            messages = messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": f"Réponse invalide : {error} Renvoie uniquement l'objet JSON corrigé."},
+            ]
+    raise ValueError(f"Analyse structurée invalide après {STRUCTURED_MAX_ATTEMPTS} tentatives : {error}")
+
+
+def format_structured_analysis(data: dict) -> str:
+    """
+    Rend l’analyse structurée en Markdown (affichage et prompt de réécriture).
+    """
+    titles = [
+        ("gaps", "Écarts entre le CV et l'offre"),
+        ("suggestions", "Suggestions"),
+        ("interview_questions", "Questions d'entretien probables"),
+        ("roadmap", "Roadmap"),
+    ]
+    parts = []
+    for field, title in titles:
+        if data.get(field):
+            parts.append(f"### {title}\n" + "\n".join(f"- {item}" for item in data[field]))
+    return "\n\n".join(parts)
+
+
+# Variantes asynchrones : les appels bloquants (session HTTP partagée) tournent dans
+# des threads, ce qui permet de lancer plusieurs requêtes Groq indépendantes en parallèle.
+
+async def analyze_cv_and_offer_async(cv_text: str, offer_text: str, use_cache: bool = True) -> str:
+    return await asyncio.to_thread(analyze_cv_and_offer, cv_text, offer_text, use_cache)
+
+
+async def generate_updated_cv_async(cv_text: str, suggestions: str, use_cache: bool = True) -> str:
+    return await asyncio.to_thread(generate_updated_cv, cv_text, suggestions, use_cache)
+
+
+async def score_cv_async(cv_text: str, offer_text: str, use_cache: bool = True) -> int:
+    return await asyncio.to_thread(score_cv, cv_text, offer_text, use_cache)
+
+
+async def analyze_cv_structured_async(cv_text: str, offer_text: str, use_cache: bool = True) -> dict:
+    return await asyncio.to_thread(analyze_cv_structured, cv_text, offer_text, use_cache)
+
+
+async def analyze_and_score_async(cv_text: str, offer_text: str, use_cache: bool = True) -> dict:
+    """
+    Lance en parallèle l’analyse structurée (un seul appel Groq : analyse + score), le score
+    local (TF-IDF) et le découpage du CV en sections pour la réécriture.
+    Retourne {"analysis": str (Markdown), "score": int, "data": dict, "local_score": int,
+    "sections": list}.
+    """
+    data, provisional, sections = await asyncio.gather(
+        analyze_cv_structured_async(cv_text, offer_text, use_cache),
+        asyncio.to_thread(local_score, cv_text, offer_text),
+        asyncio.to_thread(split_sections, cv_text),
+    )
+    return {
+        "analysis": format_structured_analysis(data),
+        "score": data["score"],
+        "data": data,
+        "local_score": provisional,
+        "sections": sections,
+    }
+
+
+def analyze_and_score(cv_text: str, offer_text: str, use_cache: bool = True) -> dict:
+    """
+    Point d’entrée synchrone (pages Streamlit) de analyze_and_score_async.
+    """
+    return asyncio.run(analyze_and_score_async(cv_text, offer_text, use_cache))
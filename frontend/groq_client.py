@@ -0,0 +1,288 @@
+# groq_client.py
+
+# """
+# groq_client.py – Client HTTP partagé pour l’API Groq (compatible OpenAI).
+# - Une seule requests.Session par processus : connexions keep-alive réutilisées
+#   (pas de nouvelle poignée de main TLS à chaque appel), pool de GROQ_POOL_SIZE connexions.
+# - Timeouts de connexion / lecture configurables (GROQ_CONNECT_TIMEOUT, GROQ_READ_TIMEOUT).
+# - Les réponses 429 et 5xx (et les erreurs réseau) sont rejouées jusqu’à GROQ_MAX_RETRIES fois,
+#   avec un backoff exponentiel à jitter, ou le délai indiqué par l’en-tête Retry-After.
+#   Un Retry-After plus long que GROQ_BACKOFF_MAX (quota épuisé) n’est pas attendu :
+#   l’erreur est levée tout de suite au lieu de gaspiller les rejeux.
+# - Un limiteur de débit (seau à jetons, GROQ_REQUESTS_PER_MINUTE) partagé par tous les
+#   utilisateurs de l’app Streamlit nous garde sous le quota Groq.
+# - stream_chat_completion() produit les tokens au fil du flux SSE de Groq (stream=true).
+# - chat_completion(..., cache_ttl=…) sert les requêtes identiques depuis le cache SQLite
+#   (llm_cache) sans appel réseau ; cache_ttl=None ou 0 force un appel frais.
+# - chat_completion(..., response_format={"type": "json_object"}, validate=…) active le
+#   mode JSON de Groq ; une réponse refusée par `validate` n’est jamais mise en cache.
+# - Chaque appel (réseau ou servi par le cache) est mesuré dans llm_telemetry : latence,
+#   tokens (champ `usage`, ou `x_groq.usage` en fin de flux), rejeux, hit de cache ;
+#   le paramètre `operation` nomme l’appel (analysis, score…).
+# """
+
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import llm_telemetry
+from llm_cache import LLM_CACHE_DISABLED, LLMCache
+
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama3-8b-8192"
+
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "60"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "4"))
+GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "1"))
+GROQ_BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "30"))
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "16"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class InvalidCompletion(ValueError):
+    """
+    Réponse refusée par la fonction `validate` de chat_completion ; `content` garde le texte brut.
+    """
+
+    def __init__(self, message: str, content: str):
+        super().__init__(message)
+        self.content = content
+
+
+class RateLimiter:
+    """
+    Seau à jetons thread-safe : `rate_per_minute` requêtes par minute, rafales jusqu’à `burst`.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, int(rate_per_minute // 6))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_session = None
+_session_lock = threading.Lock()
+limiter = RateLimiter(GROQ_REQUESTS_PER_MINUTE)
+cache = None if LLM_CACHE_DISABLED else LLMCache()
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GROQ_POOL_SIZE)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _headers() -> dict:
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("La clé GROQ_API_KEY est manquante dans l'environnement.")
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+
+def _retry_after(response) -> float:
+    """
+    Délai demandé par l’en-tête Retry-After (secondes ou date HTTP), ou None.
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _retry_delay(attempt: int, response=None) -> float:
+    """
+    Délai avant la tentative suivante : Retry-After s’il est fourni,
+    sinon backoff exponentiel plafonné avec jitter complet.
+    """
+    retry_after = _retry_after(response)
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_BASE * 2 ** attempt))
+
+
+def _post(payload: dict, stream: bool = False) -> requests.Response:
+    """
+    POST /chat/completions avec limiteur de débit et rejeu des erreurs transitoires.
+    En streaming, seul l’établissement de la réponse est rejoué (pas un flux déjà entamé).
+    Lève requests.HTTPError si l’erreur persiste ou si Retry-After dépasse GROQ_BACKOFF_MAX.
+    """
+    headers = _headers()
+    session = get_session()
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            response = session.post(
+                GROQ_API_URL,
+                headers=headers,
+                json=payload,
+                timeout=(GROQ_CONNECT_TIMEOUT, GROQ_READ_TIMEOUT),
+                stream=stream,
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == GROQ_MAX_RETRIES:
+                raise
+            time.sleep(_retry_delay(attempt))
+            continue
+
+        if response.status_code in RETRYABLE_STATUS and attempt < GROQ_MAX_RETRIES:
+            delay = _retry_delay(attempt, response)
+            # Au-delà de GROQ_BACKOFF_MAX, on abandonne plutôt que de rejouer trop tôt
+            if delay <= GROQ_BACKOFF_MAX:
+                response.close()
+                time.sleep(delay)
+                continue
+
+        response.raise_for_status()
+        # Nombre de rejeux, pour la télémétrie
+        response.retries = attempt
+        return response
+
+
+def post_chat_completion(payload: dict) -> dict:
+    """
+    Retourne le JSON complet d’une complétion (voir _post pour les rejeux).
+    """
+    return _post(payload).json()
+
+
+def _record(model: str, operation: str, start: float, usage=None, retries: int = 0,
+            cache_hit: bool = False, error: Exception = None):
+    prompt_tokens, completion_tokens = llm_telemetry.usage_tokens(usage)
+    llm_telemetry.record("groq", model, operation, time.perf_counter() - start,
+                         prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, retries=retries,
+                         cache_hit=cache_hit, error=None if error is None else type(error).__name__)
+
+
+def chat_completion(messages: list, temperature: float = 0.7, model: str = GROQ_MODEL,
+                    cache_ttl: float = None, response_format: dict = None, validate=None,
+                    operation: str = "chat") -> str:
+    """
+    Appel de complétion simple : retourne le contenu du premier message généré.
+    Avec cache_ttl (secondes), une requête identique (modèle, messages, température)
+    est servie depuis le cache disque pendant cette durée.
+    response_format est transmis tel quel à l’API (ex. {"type": "json_object"}) ;
+    validate(content) est appelé avant la mise en cache ; s’il lève ValueError,
+    chat_completion lève InvalidCompletion (avec le contenu refusé).
+    """
+    start = time.perf_counter()
+    use_cache = cache is not None and bool(cache_ttl)
+    if use_cache:
+        key = cache.key(model, messages, temperature)
+        cached = cache.get(key)
+        if cached is not None:
+            _record(model, operation, start, cache_hit=True)
+            return cached
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature
+    }
+    if response_format:
+        payload["response_format"] = response_format
+    try:
+        response = _post(payload)
+    except Exception as e:
+        _record(model, operation, start, error=e)
+        raise
+    result = response.json()
+    content = result["choices"][0]["message"]["content"]
+    error = None
+    if validate is not None:
+        try:
+            validate(content)
+        except ValueError as e:
+            error = InvalidCompletion(str(e), content)
+    _record(model, operation, start, result.get("usage"), response.retries, error=error)
+    if error is not None:
+        raise error
+    if use_cache:
+        cache.put(key, content, cache_ttl)
+    return content
+
+
+def stream_chat_completion(messages: list, temperature: float = 0.7, model: str = GROQ_MODEL,
+                           cache_ttl: float = None, operation: str = "chat"):
+    """
+    Générateur des fragments de texte de la complétion, au fil des événements SSE.
+    Une réponse en cache est restituée d’un bloc ; une réponse complète est mise en cache.
+    """
+    start = time.perf_counter()
+    use_cache = cache is not None and bool(cache_ttl)
+    if use_cache:
+        key = cache.key(model, messages, temperature)
+        cached = cache.get(key)
+        if cached is not None:
+            _record(model, operation, start, cache_hit=True)
+            yield cached
+            return
+
+    parts = []
+    usage = None
+    retries = 0
+    try:
+        with _post({
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True
+        }, stream=True) as response:
+            retries = response.retries
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                # Groq envoie la consommation de tokens dans le dernier fragment
+                usage = chunk.get("usage") or chunk.get("x_groq", {}).get("usage") or usage
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+    except Exception as e:
+        _record(model, operation, start, usage, retries, error=e)
+        raise
+    _record(model, operation, start, usage, retries)
+
+    if use_cache:
+        cache.put(key, "".join(parts), cache_ttl)
@@ -0,0 +1,108 @@
+# llm_telemetry.py
+
+# """
+# llm_telemetry.py – Mesures des appels LLM faits depuis le front (Groq, Mistral).
+# - record() : un appel = fournisseur, modèle, opération, latence, tokens du prompt et de la
+#   complétion (champ `usage` de la réponse), nombre de rejeux, hit de cache, erreur.
+# - recent() : les LLM_TELEMETRY_HISTORY derniers appels ; summary() : agrégats par
+#   (fournisseur, modèle, opération).
+# - render_debug_panel() : panneau Streamlit (barre latérale) affiché si LLM_DEBUG_PANEL=1
+#   ou avec ?debug=1 dans l’URL de la page.
+# Les mesures sont propres au processus Streamlit (toutes sessions confondues).
+# """
+
+import os
+import threading
+import time
+from collections import deque
+
+LLM_TELEMETRY_HISTORY = int(os.getenv("LLM_TELEMETRY_HISTORY", "200"))
+LLM_DEBUG_PANEL = os.getenv("LLM_DEBUG_PANEL", "0") == "1"
+
+_lock = threading.Lock()
+_calls = deque(maxlen=LLM_TELEMETRY_HISTORY)
+_totals = {}
+
+
+def record(provider: str, model: str, operation: str, seconds: float, prompt_tokens: int = None,
+           completion_tokens: int = None, retries: int = 0, cache_hit: bool = False, error: str = None):
+    call = {
+        "time": time.time(),
+        "provider": provider,
+        "model": model,
+        "operation": operation,
+        "seconds": round(seconds, 3),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "retries": retries,
+        "cache_hit": cache_hit,
+        "error": error,
+    }
+    with _lock:
+        _calls.append(call)
+        totals = _totals.setdefault((provider, model, operation), {
+            "calls": 0, "cache_hits": 0, "errors": 0, "retries": 0,
+            "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+        })
+        totals["calls"] += 1
+        totals["cache_hits"] += int(cache_hit)
+        totals["errors"] += int(error is not None)
+        totals["retries"] += retries
+        totals["seconds"] += seconds
+        totals["prompt_tokens"] += prompt_tokens or 0
+        totals["completion_tokens"] += completion_tokens or 0
+
+
+def usage_tokens(usage) -> tuple:
+    """
+    (prompt_tokens, completion_tokens) depuis un `usage` dict (Groq) ou objet (SDK Mistral).
+    """
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def recent() -> list:
+    with _lock:
+        return list(_calls)
+
+
+def summary() -> list:
+    with _lock:
+        rows = []
+        for (provider, model, operation), totals in sorted(_totals.items()):
+            network_calls = totals["calls"] - totals["cache_hits"]
+            rows.append({
+                "provider": provider,
+                "model": model,
+                "operation": operation,
+                **{k: v for k, v in totals.items() if k != "seconds"},
+                "avg_seconds": round(totals["seconds"] / network_calls, 3) if network_calls else 0.0,
+            })
+        return rows
+
+
+def render_debug_panel():
+    """
+    Panneau de débogage des appels LLM dans la barre latérale (désactivé par défaut).
+    """
+    import streamlit as st
+
+    if not (LLM_DEBUG_PANEL or st.query_params.get("debug") == "1"):
+        return
+    # Imports tardifs : ces modules importent eux-mêmes llm_telemetry
+    import prompt_builder
+    from groq_client import cache
+
+    with st.sidebar.expander("🔧 Appels LLM (debug)"):
+        st.caption("Agrégats par fournisseur / modèle / opération")
+        st.dataframe(summary(), use_container_width=True)
+        st.caption("Derniers appels")
+        st.dataframe(list(reversed(recent()))[:20], use_container_width=True)
+        prompts = prompt_builder.stats()
+        st.write(f"Tokens d'entrée économisés par le compactage : {prompts['tokens_saved']} "
+                 f"sur {prompts['tokens_before']} ({prompts['calls']} prompts)")
+        if cache is not None:
+            st.write("Cache LLM :", cache.stats())
@@ -0,0 +1,89 @@
+# local_scorer.py
+
+# """
+# local_scorer.py – Score de compatibilité CV / offre calculé localement, sans réseau.
+# - Similarité cosinus TF-IDF (tf sous-linéaire, idf lissé) entre CV et offres,
+#   calculée pour tout un lot d’un coup avec des matrices creuses SciPy.
+# - local_scores(cvs, offers) : matrice des scores provisoires 0–100 (une ligne par CV).
+# - blend_scores(local, llm) : mode hybride, moyenne pondérée par HYBRID_LOCAL_WEIGHT.
+# Sert à afficher un score instantané et à écarter les paires manifestement
+# hors sujet avant tout appel à Groq (voir batch_scoring.py).
+# """
+
+import os
+import re
+import unicodedata
+
+import numpy as np
+from scipy import sparse
+
+# Cosinus à partir duquel le score provisoire vaut 100 (les CV et offres partagent
+# rarement plus de la moitié de leur vocabulaire pondéré)
+LOCAL_SCORE_SATURATION = float(os.getenv("LOCAL_SCORE_SATURATION", "0.5"))
+HYBRID_LOCAL_WEIGHT = float(os.getenv("HYBRID_LOCAL_WEIGHT", "0.3"))
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+STOPWORDS = set("""
+a au aux avec ce ces cette dans de des du elle en et etc il ils je la le les leur lui ma mais me
+meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sont sur ta te tes
+toi ton tu un une vos votre vous y est etre avoir ete sera plus tres tout tous toute toutes
+the and or of to in for on with an as at by is are be this that from your you our we will
+""".split())
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def tokenize(text: str) -> list:
+    tokens = _TOKEN.findall(_strip_accents(text.lower()))
+    return [t for t in tokens if len(t) > 1 and t not in STOPWORDS]
+
+
+def _tfidf(docs: list) -> sparse.csr_matrix:
+    """
+    Matrice TF-IDF normalisée L2 (une ligne par document), vocabulaire appris sur le lot.
+    """
+    vocabulary = {}
+    indptr, indices, counts = [0], [], []
+    for doc in docs:
+        ids, freqs = np.unique(
+            [vocabulary.setdefault(t, len(vocabulary)) for t in tokenize(doc)], return_counts=True
+        )
+        indices.extend(ids)
+        counts.extend(freqs)
+        indptr.append(len(indices))
+
+    tf = sparse.csr_matrix(
+        (np.asarray(counts, dtype=np.float64), np.asarray(indices, dtype=np.int64), indptr),
+        shape=(len(docs), max(1, len(vocabulary))),
+    )
+    tf.data = 1.0 + np.log(tf.data)
+    df = np.bincount(tf.indices, minlength=tf.shape[1])
+    idf = np.log((1 + len(docs)) / (1 + df)) + 1.0
+    tfidf = tf @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ tfidf
+
+
+def local_scores(cv_texts: list, offer_texts: list) -> np.ndarray:
+    """
+    Scores provisoires 0–100, de forme (len(cv_texts), len(offer_texts)).
+    """
+    if not cv_texts or not offer_texts:
+        return np.zeros((len(cv_texts), len(offer_texts)))
+    matrix = _tfidf(list(cv_texts) + list(offer_texts))
+    cvs, offers = matrix[:len(cv_texts)], matrix[len(cv_texts):]
+    cosine = (cvs @ offers.T).toarray()
+    return np.rint(100 * np.clip(cosine / LOCAL_SCORE_SATURATION, 0.0, 1.0))
+
+
+def local_score(cv_text: str, offer_text: str) -> int:
+    return int(local_scores([cv_text], [offer_text])[0, 0])
+
+
+def blend_scores(local: float, llm: float, local_weight: float = HYBRID_LOCAL_WEIGHT) -> int:
+    return int(round(local_weight * local + (1 - local_weight) * llm))
@@ -31,16 +31,19 @@
 #       • Parse JSON en dict Python (json.loads).
 #       • Si erreur, afficher un message d’erreur.
 #       • Afficher métadonnées de l’offre (titre, entreprise, lieu).
-#       • Appeler analyze_cv_and_offer(cv_text, offer_text) (module groq_analyzer).
-#           – Affiche “Analyse en cours…” pendant l’appel.
+#       • Afficher immédiatement un score provisoire local (local_score, TF-IDF sans réseau).
+#       • Obtenir en un seul appel JSON (analyze_cv_structured) les écarts, suggestions,
+#         questions d’entretien, roadmap et le score ; le score provisoire reste affiché
+#         pendant l’attente. L’analyse affichée et la réécriture viennent de cette même réponse.
 #       • Afficher les suggestions IA (listes d’écarts, points à améliorer).
-#       • Calculer score de compatibilité via score_cv(cv_text, offer_text).
 #       • Afficher le score (par exemple en % ou en note sur 100).
 # =============================================================================
 
 # =============================================================================
 # 5) Génération du CV mis à jour :
-#    - Appeler generate_updated_cv(cv_text, suggestions) pour réécrire le CV.
+#    - Appeler generate_updated_cv_by_sections_stream(cv_text, suggestions) : seules les sections
+#      visées par les écarts et suggestions sont réécrites, en parallèle ; le CV affiché est
+#      mis à jour à chaque section terminée.
 #    - Générez un PDF avec generate_modified_cv_pdf(updated_cv_text, score).
 #    - Proposer un bouton st.download_button pour télécharger le PDF.
 # =============================================================================
@@ -61,8 +64,10 @@ import chardet
 import base64
 from dotenv import load_dotenv
 
-from groq_analyzer import analyze_cv_and_offer, generate_updated_cv, score_cv
+from groq_analyzer import analyze_cv_structured, format_structured_analysis, generate_updated_cv_by_sections_stream
+from local_scorer import local_score
 from cv_modifier import generate_modified_cv_pdf
+import llm_telemetry
 
 load_dotenv()
 
@@ -151,56 +156,70 @@ if job_url and uploaded_cv and st.sidebar.button("🚀 Démarrer l'analyse"):
         # st.write(f"**Entreprise :** {st.session_state.offer_company}  ")
         # st.write(f"**Lieu :** {st.session_state.offer_location}")
 
-        with st.spinner("Analyse IA avec LLaMA 3 en cours..."):
+        # Score provisoire instantané, remplacé par le score Groq une fois l'analyse terminée
+        provisional = st.empty()
+        provisional.write(
+            f"**Score provisoire (calcul local) :** "
+            f"{local_score(st.session_state.cv_text, st.session_state.offer_text)}/100"
+        )
+
+        # Analyse et score dans la même réponse JSON : un seul aller-retour Groq.
+        # Le mode JSON ne se diffuse pas : le score local ci-dessus fait patienter
+        with st.spinner("Analyse IA en cours..."):
             try:
-                st.session_state.llama_analysis = analyze_cv_and_offer(
+                analysis = analyze_cv_structured(
                     st.session_state.cv_text,
                     st.session_state.offer_text,
                 )
+                st.session_state.analysis_data = analysis
+                st.session_state.llama_analysis = format_structured_analysis(analysis)
+                st.session_state.cv_score = analysis["score"]
                 # st.write("✅ Analyse IA terminée")
             except Exception as e:
                 st.error(f"Erreur analyse IA : {e}")
+                st.session_state.analysis_data = None
                 st.session_state.llama_analysis = None
+                st.session_state.cv_score = 0
+        provisional.empty()
 
 # 6) Affichage des résultats IA
 if "llama_analysis" in st.session_state and st.session_state.llama_analysis:
     st.subheader("📌 Nos recommandations")
     st.markdown(st.session_state.llama_analysis)
 
-    with st.spinner("Calcul du score de compatibilité..."):
-        try:
-            st.session_state.cv_score = score_cv(
-                st.session_state.cv_text,
-                st.session_state.offer_text,
-            )
-            st.write(f"**Score de compatibilité du CV :** {st.session_state.cv_score}/100")
-        except Exception as e:
-            st.error(f"Erreur score : {e}")
-            st.session_state.cv_score = 0
+    st.write(f"**Score de compatibilité du CV :** {st.session_state.get('cv_score', 0)}/100")
 
-    with st.spinner("Réécriture intelligente du CV..."):
-        try:
-            # Ajout d'une contrainte explicite pour forcer la langue française
-            st.session_state.llama_analysis += "\n\nIMPORTANT : Réécris le CV uniquement en français, sans aucune partie en anglais."
-            updated_cv = generate_updated_cv(
-                st.session_state.cv_text,
-                st.session_state.llama_analysis,
-            )
-            # st.write("✅ Réécriture du CV réussie")
-        except Exception as e:
-            st.error(f"Erreur lors de la réécriture : {e}")
-            updated_cv = None
+    # Seuls les écarts et suggestions modifient le CV (pas les questions ni la roadmap) ;
+    # la consigne de langue française est dans les prompts de réécriture
+    analysis_data = st.session_state.get("analysis_data") or {}
+    suggestions = "\n".join(
+        f"- {item}" for item in analysis_data.get("gaps", []) + analysis_data.get("suggestions", [])
+    ) or st.session_state.llama_analysis
+
+    st.subheader("✏️ CV mis à jour")
+    cv_placeholder = st.empty()
+    updated_cv = None
+    try:
+        # Le CV affiché est remplacé à chaque section réécrite ; la dernière version est le CV final
+        for updated_cv in generate_updated_cv_by_sections_stream(
+            st.session_state.cv_text,
+            suggestions,
+        ):
+            cv_placeholder.text(updated_cv)
+        # st.write("✅ Réécriture du CV réussie")
+    except Exception as e:
+        st.error(f"Erreur lors de la réécriture : {e}")
+        updated_cv = None
 
     if updated_cv:
-        st.subheader("✏️ CV mis à jour")
-        st.text_area("CV revisité", updated_cv, height=350)
+        cv_placeholder.text_area("CV revisité", updated_cv, height=350)
 
         try:
             pdf_path = generate_modified_cv_pdf(
                 st.session_state.cv_text,
-                st.session_state.llama_analysis,
+                suggestions,
                 updated_cv,
-                st.session_state.cv_score,
+                st.session_state.get("cv_score", 0),
             )
             # with open(pdf_path, "rb") as f:
             #     b64_pdf = base64.b64encode(f.read()).decode("utf-8", errors="ignore")
@@ -217,6 +236,9 @@ if "llama_analysis" in st.session_state and st.session_state.llama_analysis:
             pass
 
 
+# Panneau de debug des appels LLM (LLM_DEBUG_PANEL=1 ou ?debug=1)
+llm_telemetry.render_debug_panel()
+
 # 7) Avertissement RGPD
 st.markdown(
     """
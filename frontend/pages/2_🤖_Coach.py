@@ -3,6 +3,9 @@ from mistralai import Mistral
 import os
 from dotenv import load_dotenv
 import urllib.parse
+import time
+
+import llm_telemetry
 
 # Chargement des variables d'environnement
 load_dotenv()
@@ -40,7 +43,8 @@ st.title("🤖 Assistant RH contextuel & Offres personnalisées")
 #    - st.chat_input() pour le message utilisateur.
 #    - Quand l’utilisateur envoie un message :
 #       • Construire le prompt Mistral : system + contexte (CV orig., CV mod., offre, analyse).
-#       • Appeler mistralai.chat(messages=…, temperature=…).
+#       • Appeler mistralai.chat(messages=…, temperature=…) ; latence et tokens (usage)
+#         sont enregistrés dans llm_telemetry (panneau de debug avec ?debug=1).
 #       • Afficher la réponse IA avec st.chat_message(role="assistant", …).
 #       • Conserver l’historique dans st.session_state["chat_history"].
 # =============================================================================
@@ -102,15 +106,21 @@ if prompt := st.chat_input("Posez votre question à l'assistant RH..."):
     st.chat_message("user").markdown(prompt)
     st.session_state.chat_history.append({"role": "user", "content": prompt})
 
+    start = time.perf_counter()
     try:
         response = client.chat.complete(model=model, messages=st.session_state.chat_history)
         reply = response.choices[0].message.content
+        prompt_tokens, completion_tokens = llm_telemetry.usage_tokens(response.usage)
+        llm_telemetry.record("mistral", model, "coach", time.perf_counter() - start,
+                             prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
     except Exception as e:
+        llm_telemetry.record("mistral", model, "coach", time.perf_counter() - start, error=type(e).__name__)
         reply = f"Erreur API : {e}"
 
     st.chat_message("assistant").markdown(reply)
     st.session_state.chat_history.append({"role": "assistant", "content": reply})
 
+llm_telemetry.render_debug_panel()
 
 # ------------------ RECHERCHE D'OFFRES BASÉE SUR LA FICHE DE POSTE ------------------
 
@@ -147,12 +147,14 @@ if st.button("Démarrer votre entretien vocal"):
     st.session_state["livekit_token"] = token
     st.success("Votre Entretien vocal est prêt !")
     try:
-        requests.post("https://cvanalyzer-production-1322.up.railway.app/context", json={
+        context_resp = requests.post("https://cvanalyzer-production-1322.up.railway.app/context", json={
             "cv": st.session_state.get("cv_text", ""),
             "offer": st.session_state.get("offer_text", ""),
             "analysis": st.session_state.get("llama_analysis", ""),
             "updated": st.session_state.get("updated_cv_text", "")
         })
+        # Le backend isole chaque entretien dans une session : on garde son identifiant pour /transcribe
+        st.session_state["interview_session_id"] = context_resp.json()["session_id"]
     except:
         st.warning("🔴 Impossible de transmettre le contexte à l'API.")
 
@@ -165,7 +167,7 @@ except:
     # st.error("❌ Fichier SDK LiveKit manquant.")
 
 # ------------------ Interface LiveKit ------------------
-if "livekit_token" in st.session_state and sdk_js:
+if "livekit_token" in st.session_state and "interview_session_id" in st.session_state and sdk_js:
     components.html(f"""
     <link href='https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css' rel='stylesheet'>
     <script type="module" src="https://cdn.jsdelivr.net/npm/livekit-client/dist/livekit-client.umd.min.js"></script>
@@ -176,12 +178,19 @@ if "livekit_token" in st.session_state and sdk_js:
         <div id='timer' class='fw-bold mt-3 mb-2'></div>
         <button class='btn btn-success' id='startBtn' onclick='startRecording()'>🎙️ Démarrer</button>
         <button class='btn btn-danger mt-2' id='stopBtn' onclick='stopRecording()' style='display:none;'>⏹️ Arrêter</button>
+        <div id='partial-transcript' class='text-muted fst-italic mt-2'></div>
         <audio id='response-audio' controls style='display:none; margin-top: 20px;'></audio>
         <div id='mic-alert' class='alert alert-danger mt-3' style='display:none;'>🎙️ Micro non autorisé ou erreur de permission. Vérifiez votre navigateur.</div>
     </div>
     <script>
         let mediaRecorder;
         let audioChunks = [];
+        let socket;
+        let awaitingFinal = false;
+        // Morceaux déjà envoyés sur le WebSocket courant ; "stop" demandé avant l'ouverture
+        let sentChunks = 0;
+        let stopPending = false;
+        const wsUrl = "wss://cvanalyzer-production-1322.up.railway.app/ws/transcribe?session_id={st.session_state['interview_session_id']}";
         let secondsElapsed = 0;
         let countdown;
 
@@ -207,11 +216,99 @@ if "livekit_token" in st.session_state and sdk_js:
             }}
         }}
 
+        function playAnswer(audioUrl) {{
+            const audioPlayer = document.getElementById("response-audio");
+            audioPlayer.src = audioUrl;
+            audioPlayer.style.display = "block";
+            audioPlayer.play();
+        }}
+
+        function resetButtons() {{
+            document.getElementById("timer").innerText = "";
+            document.getElementById("startBtn").style.display = "inline-block";
+            document.getElementById("stopBtn").style.display = "none";
+        }}
+
+        function showError() {{
+            document.getElementById("mic-alert").innerText = "❌ Erreur de traitement ou serveur indisponible.";
+            document.getElementById("mic-alert").style.display = "block";
+        }}
+
+        // Envoie, dans l'ordre, les morceaux pas encore transmis (le premier porte l'en-tête WebM)
+        function flushChunks() {{
+            if (!socket || socket.readyState !== WebSocket.OPEN) return;
+            while (sentChunks < audioChunks.length) socket.send(audioChunks[sentChunks++]);
+        }}
+
+        // Transcription progressive : les morceaux partent au backend pendant que le candidat parle
+        function openSocket() {{
+            const ws = new WebSocket(wsUrl);
+            socket = ws;
+            sentChunks = 0;
+            stopPending = false;
+            ws.binaryType = "arraybuffer";
+            // Les morceaux émis pendant la connexion sont gardés et partent à l'ouverture
+            ws.onopen = () => {{
+                if (socket !== ws) return;
+                flushChunks();
+                if (stopPending) {{
+                    stopPending = false;
+                    ws.send("stop");
+                }}
+            }};
+            ws.onmessage = event => {{
+                const message = JSON.parse(event.data);
+                if (message.type === "partial") {{
+                    document.getElementById("partial-transcript").innerText = message.text;
+                }} else if (message.type === "final") {{
+                    awaitingFinal = false;
+                    document.getElementById("partial-transcript").innerText = message.transcription;
+                    playAnswer(message.audio_url);
+                    resetButtons();
+                }} else if (message.type === "error") {{
+                    // audioChunks contient tout l'enregistrement : on repasse par /transcribe
+                    if (socket === ws) socket = null;
+                    if (awaitingFinal) {{
+                        awaitingFinal = false;
+                        uploadRecording();
+                    }}
+                }}
+            }};
+            ws.onerror = () => {{ if (socket === ws) socket = null; }};
+            // Fermeture sans réponse finale après "stop" : on renvoie l'enregistrement complet
+            ws.onclose = () => {{
+                if (socket === ws) socket = null;
+                if (awaitingFinal) {{
+                    awaitingFinal = false;
+                    uploadRecording();
+                }}
+            }};
+        }}
+
+        // Repli : envoi de l'enregistrement complet si le WebSocket est indisponible
+        async function uploadRecording() {{
+            const audioBlob = new Blob(audioChunks, {{ type: 'audio/wav' }});
+            const formData = new FormData();
+            formData.append("audio", audioBlob, "voice.wav");
+            formData.append("session_id", "{st.session_state['interview_session_id']}");
+            formData.append("stream", "true");
+            try {{
+                const response = await fetch("https://cvanalyzer-production-1322.up.railway.app/transcribe", {{ method: "POST", body: formData }});
+                const result = await response.json();
+                playAnswer(result.audio_url);
+            }} catch (error) {{
+                showError();
+            }}
+            resetButtons();
+        }}
+
         async function startRecording() {{
             try {{
                 const stream = await navigator.mediaDevices.getUserMedia({{ audio: true }});
                 mediaRecorder = new MediaRecorder(stream);
                 audioChunks = [];
+                document.getElementById("partial-transcript").innerText = "";
+                openSocket();
                 secondsElapsed = 0;
                 document.getElementById("startBtn").style.display = "none";
                 document.getElementById("stopBtn").style.display = "inline-block";
@@ -220,31 +317,30 @@ if "livekit_token" in st.session_state and sdk_js:
                     document.getElementById("timer").innerText = `🎤 Enregistrement : ${{secondsElapsed}}s...`;
                 }}, 1000);
                 mediaRecorder.ondataavailable = event => {{
-                    if (event.data.size > 0) audioChunks.push(event.data);
+                    if (event.data.size > 0) {{
+                        audioChunks.push(event.data);
+                        flushChunks();
+                    }}
                 }};
                 mediaRecorder.onstop = async () => {{
                     clearInterval(countdown);
                     document.getElementById("timer").innerText = "⏹️ Traitement...";
-                    const audioBlob = new Blob(audioChunks, {{ type: 'audio/wav' }});
-                    const formData = new FormData();
-                    formData.append("audio", audioBlob, "voice.wav");
-                    try {{
-                        const response = await fetch("https://cvanalyzer-production-1322.up.railway.app/transcribe", {{ method: "POST", body: formData }});
-                        const result = await response.json();
-                        const audioUrl = result.audio_url;
-                        const audioPlayer = document.getElementById("response-audio");
-                        audioPlayer.src = audioUrl;
-                        audioPlayer.style.display = "block";
-                        audioPlayer.play();
-                    }} catch (error) {{
-                        document.getElementById("mic-alert").innerText = "❌ Erreur de traitement ou serveur indisponible.";
-                        document.getElementById("mic-alert").style.display = "block";
+                    if (socket && socket.readyState === WebSocket.OPEN) {{
+                        // Le dernier morceau est émis avant onstop : il ne reste que la fin à transcrire
+                        awaitingFinal = true;
+                        flushChunks();
+                        socket.send("stop");
+                        return;
+                    }}
+                    if (socket && socket.readyState === WebSocket.CONNECTING) {{
+                        // Enregistrement très court : tout partira à l'ouverture, suivi de "stop"
+                        awaitingFinal = true;
+                        stopPending = true;
+                        return;
                     }}
-                    document.getElementById("timer").innerText = "";
-                    document.getElementById("startBtn").style.display = "inline-block";
-                    document.getElementById("stopBtn").style.display = "none";
+                    await uploadRecording();
                 }};
-                mediaRecorder.start();
+                mediaRecorder.start(1000);
             }} catch (err) {{
                 document.getElementById("mic-alert").style.display = "block";
             }}
@@ -0,0 +1,173 @@
+# prompt_builder.py
+
+# """
+# prompt_builder.py – Construction des prompts Groq sous un budget de tokens.
+# - count_tokens() : estimation rapide (~4 caractères par token), sans tokenizer.
+# - compact_text() : ne touche pas à un texte déjà sous son budget. Sinon, normalise les
+#   espaces, retire les lignes répétées d'affilée puis, si le texte dépasse encore son
+#   budget, les blocs les moins informatifs ; en dernier recours, tronque le dernier bloc gardé.
+# - Un texte scrapé (offre) est en plus toujours nettoyé : lignes répétées n'importe où
+#   dans le texte et bruit de scraping (cookies, partage, newsletter…). Un CV ne l'est
+#   jamais : deux expériences partagent légitimement des lignes ("Paris, France"…).
+# - build_messages() : répartit le budget entre les blocs du prompt utilisateur
+#   (CV, offre, suggestions…) et retourne les messages + un rapport de compaction.
+# - Chaque appel est comptabilisé : stats() donne les tokens économisés par appel
+#   (derniers appels) et au total.
+# PROMPT_TOKEN_BUDGET borne le prompt utilisateur ; le reste du contexte de
+# llama3-8b-8192 est laissé à la réponse.
+# """
+
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from local_scorer import tokenize
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "5000"))
+PROMPT_STATS_HISTORY = int(os.getenv("PROMPT_STATS_HISTORY", "50"))
+
+# Lignes typiques des pages d'offres scrapées qui n'apportent rien au modèle
+BOILERPLATE = re.compile(
+    r"cookie|newsletter|partager (l'|cette )?offre|share (this|on)|suivez[- ]nous|follow us|"
+    r"tous droits réservés|all rights reserved|©|politique de confidentialité|privacy policy|"
+    r"mentions légales|conditions (générales|d'utilisation)|se connecter|s'inscrire|"
+    r"créer (une|un) (alerte|compte)|télécharger l'app|offres similaires|voir (plus|toutes les offres)|"
+    r"^(accueil|menu|rechercher|retour|postuler|candidater|fermer|sauvegarder)$",
+    re.IGNORECASE,
+)
+_SPACES = re.compile(r"[ \t ]+")
+_BLANKS = re.compile(r"\n{3,}")
+
+_stats_lock = threading.Lock()
+_history = deque(maxlen=PROMPT_STATS_HISTORY)
+_totals = {"calls": 0, "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0}
+
+
+def count_tokens(text: str) -> int:
+    # Approximation usuelle : ~4 caractères par token
+    return len(text) // 4 + 1 if text else 0
+
+
+def _clean_lines(text: str, scraped: bool = False) -> str:
+    """
+    Normalise les espaces et retire les lignes répétées d'affilée (casse et espaces ignorés).
+    scraped=True : retire aussi le bruit et toute ligne déjà vue plus haut.
+    Les lignes vides sont conservées (au plus une d'affilée) pour garder les blocs.
+    """
+    seen = set()
+    previous = None
+    lines = []
+    for line in text.splitlines():
+        line = _SPACES.sub(" ", line).strip()
+        if not line:
+            lines.append("")
+            previous = None
+            continue
+        key = line.lower()
+        if key == previous:
+            continue
+        previous = key
+        if scraped and (key in seen or BOILERPLATE.search(line) or not any(c.isalnum() for c in line)):
+            continue
+        seen.add(key)
+        lines.append(line)
+    return _BLANKS.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _information(block: str) -> float:
+    """
+    Densité d'information d'un bloc : mots distincts (hors mots vides) par token.
+    """
+    return len(set(tokenize(block))) / count_tokens(block)
+
+
+def compact_text(text: str, max_tokens: int, scraped: bool = False) -> str:
+    """
+    Réduit `text` sous `max_tokens` en gardant l'ordre d'origine des blocs conservés.
+    """
+    text = text or ""
+    if scraped:
+        text = _clean_lines(text, scraped=True)
+    if count_tokens(text) <= max_tokens:
+        return text
+    text = _clean_lines(text)
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    blocks = [b for b in text.split("\n\n") if b.strip()]
+    # On garde les blocs les plus denses jusqu'à épuisement du budget
+    ranked = sorted(range(len(blocks)), key=lambda i: _information(blocks[i]), reverse=True)
+    kept, used = set(), 0
+    for i in ranked:
+        cost = count_tokens(blocks[i]) + 1
+        if used + cost <= max_tokens:
+            kept.add(i)
+            used += cost
+    if not kept:
+        # Un seul bloc énorme (texte sans paragraphes) : troncature
+        return blocks[ranked[0]][:max(0, max_tokens - 1) * 4].rstrip()
+    return "\n\n".join(blocks[i] for i in sorted(kept))
+
+
+def _allocate(sizes: list, weights: list, budget: int) -> list:
+    """
+    Répartit `budget` au prorata des poids ; ce qu'un bloc court n'utilise pas
+    est redistribué aux autres.
+    """
+    allowances = [0] * len(sizes)
+    pending = [i for i in range(len(sizes)) if sizes[i] > 0]
+    while pending:
+        total_weight = sum(weights[i] for i in pending)
+        share = {i: budget * weights[i] / total_weight for i in pending}
+        fitting = [i for i in pending if sizes[i] <= share[i]]
+        if not fitting:
+            for i in pending:
+                allowances[i] = int(share[i])
+            break
+        for i in fitting:
+            allowances[i] = sizes[i]
+            budget -= sizes[i]
+            pending.remove(i)
+    return allowances
+
+
+def _record(name: str, report: dict):
+    with _stats_lock:
+        _history.append({"name": name, "time": time.time(), **report})
+        _totals["calls"] += 1
+        for k in ("tokens_before", "tokens_after", "tokens_saved"):
+            _totals[k] += report[k]
+
+
+def build_messages(system_prompt: str, sections: list, footer: str,
+                   budget: int = PROMPT_TOKEN_BUDGET, name: str = "prompt") -> tuple:
+    """
+    sections : liste de (titre, texte, poids) ou (titre, texte, poids, scraped) ; scraped=True
+    pour une offre scrapée. Un texte n'est compacté que s'il dépasse sa part du budget, pour que
+    le prompt utilisateur tienne dans `budget` tokens (hors prompt système).
+    Retourne (messages, rapport) ; le rapport est aussi ajouté à stats().
+    """
+    sections = [(title, text or "", weight, bool(extra and extra[0])) for title, text, weight, *extra in sections]
+    fixed = count_tokens(footer) + sum(count_tokens(f"=== {title} ===\n\n\n") for title, *_ in sections)
+    texts = [_clean_lines(text, scraped=True) if scraped else text for _, text, _, scraped in sections]
+    allowances = _allocate([count_tokens(t) for t in texts], [weight for _, _, weight, _ in sections],
+                           max(0, budget - fixed))
+    compacted = [compact_text(t, allowance) for t, allowance in zip(texts, allowances)]
+
+    user_prompt = "".join(f"=== {title} ===\n{text}\n\n" for (title, *_), text in zip(sections, compacted)) + footer
+    before = fixed + sum(count_tokens(text) for _, text, _, _ in sections)
+    after = count_tokens(user_prompt)
+    report = {"tokens_before": before, "tokens_after": after, "tokens_saved": max(0, before - after)}
+    _record(name, report)
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user",   "content": user_prompt}
+    ], report
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {**_totals, "budget": PROMPT_TOKEN_BUDGET, "recent": list(_history)}